@@ -1,34 +1,99 @@
 """Define a gateway class for managing MQTT connections within the gateway"""
 
 import asyncio
+import copy
 import json
 import logging
 import time
+from collections import deque
 from datetime import datetime
+from functools import partial
 from zoneinfo import ZoneInfo
 from homeassistant.helpers import area_registry as ar
+from homeassistant.helpers import device_registry as dr
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_NAME, EVENT_HOMEASSISTANT_STOP
-from homeassistant.core import HomeAssistant, Event
+from homeassistant.core import HomeAssistant, Event, callback
 from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.components.mqtt.const import CONF_CERTIFICATE
 from .mdns import MdnsScanner
 from .const import (
+    DOMAIN,
     MQTT_CLIENT_INSTANCE,
     CONF_LIGHT_DEVICE_TYPE,
     EVENT_ENTITY_REGISTER,
     MQTT_TOPIC_PREFIX,
-    EVENT_ENTITY_STATE_UPDATE,
     DEVICE_COUNT_MAX,
+    DEVICE_LIST_PARALLELISM,
+    DEVICE_PAGE_SIZE_MIN,
+    DEVICE_PAGE_TARGET_BYTES,
+    DEVICE_PAGE_TARGET_LATENCY,
     TEMP_MQTT_TOPIC_PREFIX,
     LOG_REPORT_Q8,
+    CONF_INBOUND_MAX_SIZE,
+    CONF_INBOUND_EVENT_POLICY,
+    CONF_INBOUND_REPORT_POLICY,
 )
+from .codec import json_dumps, json_loads
+from .correlator import RequestCorrelator
+from .entity import StateRouter
+from .inbound import DEFAULT_INBOUND_MAX_SIZE, DEFAULT_INBOUND_POLICIES
 from .mqtt import MqttClient
+from .topic_trie import reduce_topic_filters
+from .topology import TOPOLOGY_SAVE_DELAY, TopologyStore
 
 from homeassistant.helpers.storage import Store
 
 _LOGGER = logging.getLogger(__name__)
 INPUT_SCHEMA = ["a100", "a101", "a102", "a103"]
+# Seconds during which a repeated device event with the same payload is ignored
+EVENT_DEDUPE_WINDOW = 0.5
+# Seconds a forwarded device state suppresses identical reports, after that the
+# next report goes through even if unchanged, so a failed optimistic update heals
+STATE_CACHE_TTL = 300
+# Seconds without light events before the light group states are refreshed ...
+GROUP_REFRESH_DEBOUNCE = 5
+# ... and the longest a refresh is delayed by a steady stream of light events
+GROUP_REFRESH_MAX_WAIT = 15
+# Seconds sns reported without state are collected before one q5 lookup ...
+STATE_LOOKUP_WINDOW = 1
+# ... and during which a sn that was looked up is not looked up again
+STATE_LOOKUP_COOLDOWN = 30
+# devType -> (route suffix, state fields the entity reads or None for all) of
+# each entity of a device, "state" (availability) is sent to every entity
+FANOUT_TABLE = {
+    # Switch: relays, motion
+    2: (("", ("state", "relays")), ("M", ("state", "a15"))),
+    # Constant temperature panel: climate, floor heating, fresh air fan
+    9: (("", None), ("H", None), ("F", ("state", "a109", "a115", "a116"))),
+    # Input module, one binary sensor per input
+    16: tuple((f"_{name}", ("state", name)) for name in INPUT_SCHEMA),
+    # Sensor: illuminance, motion, relay
+    7: (("L", ("state", "a14")), ("M", ("state", "a15")), ("", ("state", "a121"))),
+    # Energy meter: relay, voltage, current, energy, active power
+    20: (
+        ("", ("state", "a41")),
+        ("V", ("state", "a155")),
+        ("C", ("state", "a158")),
+        ("E", ("state", "a173")),
+        ("P", ("state", "a161")),
+    ),
+}
+DEFAULT_FANOUT = (("", None),)
+# Device fields updated in the device registry when they change
+DEVICE_INFO_FIELDS = ("name", "model")
+# Seconds to wait for the gateway to answer a center/q* request
+REQUEST_TIMEOUT = 10
+# q5 seq of the state lookups of devices that reported without state ...
+STATE_LOOKUP_SEQ = 3
+# ... and of the state refresh of a resumed session. Answered the same way, but
+# on its own seq so a lookup reply cannot answer a refresh page
+STATE_REFRESH_SEQ = 5
+# Entry option -> topic suffix whose inbound drop policy it sets
+INBOUND_POLICY_OPTIONS = {
+    CONF_INBOUND_EVENT_POLICY: "event/3",
+    CONF_INBOUND_REPORT_POLICY: "report/q8",
+}
 SOURCE_TYPE = {
     1: "云端",
     2: "移动端APP",
@@ -169,6 +234,13 @@ NMNLOG_TEMPLATES = {
 }
 
 
+def _response_key(suffix: str, seq, data) -> tuple:
+    """Correlation key of a request or response, paged ones also match on start."""
+    if isinstance(data, dict) and "start" in data:
+        return suffix, seq, data["start"]
+    return suffix, seq
+
+
 class Gateway:
     """Class for gateway and managing MQTT connections within the gateway"""
 
@@ -176,6 +248,8 @@ class Gateway:
         """Init dummy hub."""
         self.hass = hass
         self._entry = entry
+        # Connection data the client was set up with, options do not need a reconnect
+        self.entry_data = dict(entry.data)
         self._last_init_time = None
         self.tmp_a19 = None
 
@@ -205,61 +279,166 @@ class Gateway:
 
         self.init_state = False
 
+        # True once the full init sequence (q33/q5/q28/q71/q82) was answered in full
+        self.topology_synced = False
+
         self.device_map = {}
 
+        # Topic suffix -> handler, the first suffix a topic ends with wins.
+        # Resolved once per subscription, see _topic_callback
+        self._topic_handlers = {
+            "p5": self._async_on_device_list,
+            "p28": self._async_on_scene_list,
+            "p71": self._async_on_task_automation_list,
+            "event/3": self._async_on_device_state,
+            "event/4": self._async_on_event_4,
+            "report/q5": self._async_on_report,
+            "report/q7": self._async_on_report,
+            "report/q8": self._async_on_log_report,
+            "event/5": self._async_on_group_state,
+            "p33": self._async_on_basic_data,
+            "p55": self._async_on_media_player_state,
+            "p82": self._async_on_light_group_status,
+        }
+
+        # Requests waiting for their center/p* response
+        self._requests = RequestCorrelator(hass.loop)
+
+        # q5 page size, adapted to the gateway's response latency and payload size
+        self._device_page_size = DEVICE_COUNT_MAX
+
+        # Seconds the last full init sequence took, None until one completed
+        self.startup_duration: float | None = None
+
+        # Pending light group refresh, see request_group_refresh
+        self._group_refresh_handle: asyncio.TimerHandle | None = None
+        self._group_refresh_first = 0.0
+
+        # sns waiting for a state lookup and sn -> monotonic time of its last lookup
+        self._state_lookup_pending: dict[str, None] = {}
+        self._state_lookup_times: dict[str, float] = {}
+        self._state_lookup_handle: asyncio.TimerHandle | None = None
+        self.state_lookup_stats = {"sns": 0, "skipped": 0}
+        # Monotonic send times of the q5 requests of the last minute
+        self._q5_request_times: deque[float] = deque()
+
+        # Device sn or light group "room-subgroup" -> (monotonic time, last forwarded state)
+        self._last_states: dict[str, tuple[float, dict]] = {}
+        self.state_stats = {"forwarded": 0, "suppressed": 0}
+        # Hands the forwarded states to this gateway's entities, device keys such
+        # as light group "room-subgroup" ids are only unique within one gateway
+        self.state_router = StateRouter()
+        # Device sn -> (route key, fields or None for all) of each of its entities,
+        # compiled from FANOUT_TABLE when the device is registered
+        self._fanout_routes: dict[str, tuple] = {}
+
+        # (topic, payload) of recently handled device events -> monotonic time
+        self._recent_events: dict[tuple[str, bytes], float] = {}
+
         self.sns = []
 
         self.media_player_sn = {}
 
         self.n_tmp = 10000
 
+        # Last known topology, entities are created from it at setup
+        self._topology_store = TopologyStore(hass, entry.entry_id)
+        # "component/unique_id" -> {"component", "device"} of every entity created,
+        # restored from the saved topology or registered since. Known entities are
+        # not registered again, only their state and device info are updated
+        self._known_entities: dict[str, dict] = {}
+        self._known_sns: set[str] = set()
+        # Entities seen since the current sync started
+        self._live_entities: dict[str, dict] = {}
+        self.restored_entity_count = 0
+        self._request_timeouts = 0
+
         self._response_data = {}
 
         """Lighting Control Type"""
         self.light_device_type = entry.data[CONF_LIGHT_DEVICE_TYPE]
 
-        self.hass.data[MQTT_CLIENT_INSTANCE] = MqttClient(
+        self.hass.data.setdefault(MQTT_CLIENT_INSTANCE, {})[entry.entry_id] = MqttClient(
             self.hass,
             self._entry,
             self._entry.data,
+            **self.inbound_options(),
         )
 
         async def async_stop_mqtt(_event: Event):
             """Stop MQTT component."""
             await self.disconnect()
 
-        self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_stop_mqtt)
+        # Removed when the entry unloads, its client is gone from the registry by then.
+        # Not listen_once, removing a listener that already fired logs an error
+        entry.async_on_unload(
+            self.hass.bus.async_listen(EVENT_HOMEASSISTANT_STOP, async_stop_mqtt)
+        )
 
     async def reconnect(self, entry: ConfigEntry):
         """Reconnect gateway MQTT"""
         # _LOGGER.warning("重新连接 async  reconnect")
-        mqtt_client: MqttClient = self.hass.data[MQTT_CLIENT_INSTANCE]
+        mqtt_client = self.mqtt_client
         mqtt_client.conf = entry.data
         await mqtt_client.async_disconnect()
 
-        self.hass.data[MQTT_CLIENT_INSTANCE] = MqttClient(
+        mqtt_client = MqttClient(
             self.hass,
             self._entry,
             self._entry.data,
+            **self.inbound_options(),
         )
-
-        mqtt_client: MqttClient = self.hass.data[MQTT_CLIENT_INSTANCE]
+        self.hass.data[MQTT_CLIENT_INSTANCE][self._entry.entry_id] = mqtt_client
         mqtt_client.conf = entry.data
 
         mqtt_client.init_client()
         await mqtt_client.async_connect()
 
+    def inbound_options(self) -> dict:
+        """Inbound buffer bound and drop policies, from the entry options"""
+        options = self._entry.options
+        policies = dict(DEFAULT_INBOUND_POLICIES)
+        for option, suffix in INBOUND_POLICY_OPTIONS.items():
+            if option in options:
+                policies[suffix] = options[option]
+        return {
+            "inbound_max_size": int(options.get(CONF_INBOUND_MAX_SIZE, DEFAULT_INBOUND_MAX_SIZE)),
+            "inbound_policies": policies,
+        }
+
+    @callback
+    def async_reinit(self, entry: ConfigEntry) -> None:
+        """Reconnect and initialize the gateway again in a new task"""
+        self.entry_data = dict(entry.data)
+        self.reconnect_flag = True
+        self.hass.async_create_task(self.init(entry, True))
+
     async def disconnect(self):
         """Disconnect gateway MQTT connection"""
+        if self._group_refresh_handle is not None:
+            self._group_refresh_handle.cancel()
+            self._group_refresh_handle = None
+        if self._state_lookup_handle is not None:
+            self._state_lookup_handle.cancel()
+            self._state_lookup_handle = None
+            self._state_lookup_pending.clear()
 
-        mqtt_client: MqttClient = self.hass.data[MQTT_CLIENT_INSTANCE]
+        await self.mqtt_client.async_disconnect()
 
-        await mqtt_client.async_disconnect()
+    @property
+    def mqtt_client(self) -> MqttClient:
+        """MQTT client of this gateway's config entry"""
+        return self.hass.data[MQTT_CLIENT_INSTANCE][self._entry.entry_id]
 
     async def report_q5_init(self, device_list):
         for device in device_list:
             device_type = device["devType"]
             device["unique_id"] = f"{device['sn']}"
+            self._compile_fanout_route(device["sn"], device_type)
+
+            if device["sn"] in self._known_sns:
+                # Entities already exist, bring their state up to date
+                await self._exec_event_3(device)
 
             state = int(device["state"])
 
@@ -329,7 +508,8 @@ class Gateway:
                     await self._add_entity("media_player", device)
                     self.n_tmp += 1
                 else:
-                    pass
+                    device["num"] = self.media_player_sn[device["sn"]]
+                    self._remember_entity("media_player", device)
 
             if "subgroup" in device:
                 self.device_map[device["sn"]] = {
@@ -337,16 +517,61 @@ class Gateway:
                     "subgroup": device["subgroup"],
                 }
 
-    async def _async_mqtt_subscribe(self, msg):
+    def _is_duplicate_event(self, topic: str, payload: bytes) -> bool:
+        """Return True if the same event was handled within EVENT_DEDUPE_WINDOW."""
+        now = time.monotonic()
+        recent = self._recent_events
+        # Entries are in insertion order, drop the expired ones from the front
+        while recent:
+            key = next(iter(recent))
+            if now - recent[key] < EVENT_DEDUPE_WINDOW:
+                break
+            del recent[key]
+        key = (topic, payload)
+        if key in recent:
+            return True
+        recent[key] = now
+        return False
+
+    def register_topic_handler(self, suffix: str, handler) -> None:
+        """Route topics ending with suffix to handler(topic, payload).
+
+        Only subscriptions made after the call pick up the handler.
+        """
+        self._topic_handlers[suffix] = handler
+
+    def _resolve_topic_handler(self, topic: str):
+        """Return the handler of the first suffix the topic ends with."""
+        for suffix, handler in self._topic_handlers.items():
+            if topic.endswith(suffix):
+                return handler
+        return None
+
+    def _topic_callback(self, topic_filter: str):
+        """Return the message callback of a subscription, its handler resolved once."""
+        return partial(
+            self._async_mqtt_subscribe,
+            handler=self._resolve_topic_handler(topic_filter),
+        )
+
+    async def _async_mqtt_subscribe(self, msg, handler=None):
         """Process received MQTT messages"""
         # msg = msg.strip()
-        payload = msg.payload
+        # Subscribed without an encoding, the raw bytes are parsed directly
+        payload = msg.payload.rstrip(b"\x00")
+        payload_size = len(payload)
         topic = msg.topic
         # _LOGGER.warning(f"topic:{topic} payload:{payload}")
 
+        if handler is None and (handler := self._resolve_topic_handler(topic)) is None:
+            return
+
+        if handler == self._async_on_device_state and self._is_duplicate_event(topic, payload):
+            return
+
         if payload:
             try:
-                payload = json.loads(payload)
+                payload = json_loads(payload)
 
                 # store = Store(self.hass, 1, f'test/{topic}')
                 # await store.async_save(payload["data"])
@@ -358,327 +583,433 @@ class Gateway:
             _LOGGER.warning("JSON None")
             return
 
-        if topic.endswith("p5"):
-            seq = payload["seq"]
-
-            start = payload["data"]["start"]
-            count = payload["data"]["count"]
-            total = payload["data"]["total"]
-            sns_tmp = []
-            # _LOGGER.warning(f"q5 data:{payload}")
-            model = payload["data"]["list"]
-            # for data_tmp in model:
-            # if data_tmp["model"] == "ILight2-S1":
-            #   sns_tmp.append(data_tmp['sn'])
-            # if sns_tmp:
-            # store = Store(self.hass, 1, f'test/model')
-            #  await store.async_save(sns_tmp)
-
-            """Device List data"""
-            device_list = payload["data"]["list"]
-
-            if seq == 1:
-                await self.report_q5_init(device_list)
-                if start + count < total:
-                    data = {
-                        "start": start + count,
-                        "max": DEVICE_COUNT_MAX,
-                        "devTypes": self.devTypes,
-                    }
-                    await self._async_mqtt_publish(
-                        f"P/{self.mqttAddr}/center/q5", data, seq
-                    )
-            elif seq == 2:
-
-                await self.report_q5_init(device_list)
-                if start + count < total:
-                    data = {
-                        "start": start + count,
-                        "max": DEVICE_COUNT_MAX,
-                        "sns": self.sns,
-                    }
-                    await self._async_mqtt_publish(
-                        f"P/{self.mqttAddr}/center/q5", data, seq
+        try:
+            await handler(topic, payload)
+        finally:
+            # Waiters resume once the response has been processed
+            if isinstance(payload, dict) and "seq" in payload:
+                self._requests.resolve(
+                    _response_key(topic.rsplit("/", 1)[-1], payload["seq"], payload.get("data")),
+                    (payload, payload_size),
+                )
+
+    async def async_request(self, query: str, data: object, seq=2, timeout=REQUEST_TIMEOUT):
+        """Publish a center/q<N> request and return the payload of its p<N> response.
+
+        Returns None if the gateway does not answer within timeout seconds.
+        """
+        if (response := await self._async_request(query, data, seq, timeout)) is None:
+            return None
+        return response[0]
+
+    async def _async_request(self, query: str, data: object, seq, timeout):
+        """Like async_request, returns the payload and its size in bytes."""
+        key = _response_key(f"p{query[1:]}", seq, data)
+        future = self._requests.expect(key)
+        try:
+            await self._async_mqtt_publish(f"P/{self.mqttAddr}/center/{query}", data, seq)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._request_timeouts += 1
+            _LOGGER.warning("网关未在%s秒内响应 %s (seq: %s)", timeout, query, seq)
+            return None
+        finally:
+            self._requests.discard(key, future)
+
+    async def _async_fetch_device_list(self, query: dict, seq: int) -> None:
+        """Request every q5 page of a device query, the p5 handler registers the entities.
+
+        The first page tells the total, the remaining ranges are then requested
+        DEVICE_LIST_PARALLELISM at a time.
+        """
+        first = await self._async_fetch_device_page(query, seq, 0, self._device_page_size)
+        if first is None:
+            return
+        start = first["start"] + first["count"]
+        total = first["total"]
+        if first["count"] == 0 or start >= total:
+            return
+
+        page_size = self._device_page_size
+        semaphore = asyncio.Semaphore(DEVICE_LIST_PARALLELISM)
+
+        async def fetch_range(range_start: int, range_end: int) -> None:
+            async with semaphore:
+                # The gateway may answer with fewer devices than asked for
+                while range_start < range_end:
+                    page = await self._async_fetch_device_page(
+                        query, seq, range_start, range_end - range_start
                     )
-            elif seq == 3:
-                for device in device_list:
-                    await self._exec_event_3(device)
-
-        elif topic.endswith("p28"):
-            """Scene List data"""
-            scene_list = payload["data"]
-            room_map = self.room_map
-            for scene in scene_list:
-                self.scene_map[scene["id"]] = scene["name"]
-                scene["unique_id"] = f"{scene['id']}"
-                room_id = scene["room"]
-                if room_id == 0:
-                    scene["room_name"] = "全屋"
-                else:
-                    scene["room_name"] = room_map.get(room_id, {}).get("name", "未知房间")
-                await self._add_entity("scene", scene)
+                    if page is None or page["count"] == 0:
+                        return
+                    range_start = page["start"] + page["count"]
 
-        elif topic.endswith("p71"):
-            task_automation_list = payload["data"]
-            for task_automation in task_automation_list:
-                self.task_automation_map[task_automation["id"]] = task_automation[
-                    "name"
-                ]
+        await asyncio.gather(
+            *(
+                fetch_range(range_start, min(range_start + page_size, total))
+                for range_start in range(start, total, page_size)
+            )
+        )
 
-        elif topic.endswith("event/3"):
-            """Device state data"""
-            stats_list = payload["data"]
+    async def _async_fetch_device_page(
+            self, query: dict, seq: int, start: int, count: int
+    ) -> dict | None:
+        """Request one q5 page and adapt the page size to how it was answered."""
+        started = time.monotonic()
+        response = await self._async_request(
+            "q5", {"start": start, "max": count, **query}, seq, REQUEST_TIMEOUT
+        )
+        if response is None:
+            # Try smaller pages next time
+            self._device_page_size = max(DEVICE_PAGE_SIZE_MIN, self._device_page_size // 2)
+            return None
+        payload, payload_size = response
+        page = payload["data"]
+        if page["count"]:
+            elapsed = max(time.monotonic() - started, 0.001)
+            by_latency = page["count"] * DEVICE_PAGE_TARGET_LATENCY / elapsed
+            by_size = page["count"] * DEVICE_PAGE_TARGET_BYTES / max(payload_size, 1)
+            self._device_page_size = int(
+                max(DEVICE_PAGE_SIZE_MIN, min(DEVICE_COUNT_MAX, by_latency, by_size))
+            )
+        return page
+
+    async def _async_on_device_list(self, topic: str, payload: dict) -> None:
+        """Device list (p5), pages are requested by _async_fetch_device_list"""
+        seq = payload["seq"]
+
+        sns_tmp = []
+        # _LOGGER.warning(f"q5 data:{payload}")
+        model = payload["data"]["list"]
+        # for data_tmp in model:
+        # if data_tmp["model"] == "ILight2-S1":
+        #   sns_tmp.append(data_tmp['sn'])
+        # if sns_tmp:
+        # store = Store(self.hass, 1, f'test/model')
+        #  await store.async_save(sns_tmp)
+
+        """Device List data"""
+        device_list = payload["data"]["list"]
+
+        if seq == 1 or seq == 2:
+            await self.report_q5_init(device_list)
+        elif seq == STATE_LOOKUP_SEQ or seq == STATE_REFRESH_SEQ:
+            for device in device_list:
+                await self._exec_event_3(device)
+
+    async def _async_on_scene_list(self, topic: str, payload: dict) -> None:
+        """Scene List data"""
+        scene_list = payload["data"]
+        room_map = self.room_map
+        for scene in scene_list:
+            self.scene_map[scene["id"]] = scene["name"]
+            scene["unique_id"] = f"{scene['id']}"
+            room_id = scene["room"]
+            if room_id == 0:
+                scene["room_name"] = "全屋"
+            else:
+                scene["room_name"] = room_map.get(room_id, {}).get("name", "未知房间")
+            await self._add_entity("scene", scene)
 
-            string_array = ["sn", "workingTime", "powerSavings"]
-            # 过滤不用查询的字段
+    async def _async_on_task_automation_list(self, topic: str, payload: dict) -> None:
+        """Task automation list"""
+        task_automation_list = payload["data"]
+        for task_automation in task_automation_list:
+            self.task_automation_map[task_automation["id"]] = task_automation[
+                "name"
+            ]
 
-            string_filter = ["a109", "a15", "travel", "relays"]
+    async def _async_on_device_state(self, topic: str, payload: dict) -> None:
+        """Device state data"""
+        stats_list = payload["data"]
 
-            string_light_filter = ["on", "rgb", "level", "kelvin"]
+        string_array = ["sn", "workingTime", "powerSavings"]
+        # 过滤不用查询的字段
 
-            flag = False
+        string_filter = ["a109", "a15", "travel", "relays"]
 
-            sns = []
+        string_light_filter = ["on", "rgb", "level", "kelvin"]
 
-            for state in stats_list:
-                if any(key in state for key in string_light_filter):
-                    flag = True
-                    await self._exec_event_3(state)
+        flag = False
 
-                elif any(key in state for key in string_filter):
-                    await self._exec_event_3(state)
-                else:
-                    sns.append(state["sn"])
-
-                if "workingTime" in state or "powerSavings" in state:
-                    for key in state.keys():
-                        if key not in string_array:
-                            flag = True
-
-            if sns:
-                data = {
-                    "start": 0,
-                    "max": DEVICE_COUNT_MAX,
-                    "sns": sns,
-                }
-                await self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q5", data, 3)
-
-            if flag:
-                await self.sync_group_status(False)
-        elif topic.endswith("event/4"):
-            _LOGGER.debug(f"event/4 data:{payload}")
-
-        elif topic.endswith("report/q5") or topic.endswith("report/q7"):
-            _LOGGER.debug(f"report/q5:{payload}")
-            # payload["timestamp"] = timestamp.isoformat()
-            message = json.dumps(payload, ensure_ascii=False, indent=4)
-            await self.hass.services.async_call(
-                "persistent_notification",
-                "create",
-                {"title": topic, "message": message, "notification_id": topic},
-                blocking=True,
-            )
+        sns = []
 
-        elif topic.endswith("report/q8"):
-            payload = self.log_data(payload)
-            log_data = payload["data"].get("list")
-            # _LOGGER.warning(f"！！！！report/q8:{log_data}")
-            for item in log_data:
-                self.hass.bus.async_fire(LOG_REPORT_Q8, item)
-
-        elif topic.endswith("event/5"):
-            group_list = payload["data"]
-            _LOGGER.debug(f"event/5 data:{payload}")
-            for group in group_list:
-                if "a7" in group and "a8" in group and "a9" in group:
-                    device_type = group["a7"]
-                    room_id = group["a8"]
-                    group_id = group["a9"]
-                    data = {}
-                    if "a10" in group:
-                        data["on"] = group["a10"]
-                    if "a11" in group:
-                        data["level"] = group["a11"]
-                    if "a12" in group:
-                        data["kelvin"] = group["a12"]
-                    if "a13" in group and group["a13"] != 0:
-                        data["rgb"] = group["a13"]
-                    if device_type == 1 and data:
-                        await self._init_or_update_light_group(
-                            2, room_id, "", group_id, "", data
-                        )
-
-        elif topic.endswith("p33"):
-            """Basic data, including room information, light group information, curtain group information"""
-            registry = ar.async_get(self.hass)
-
-            for room in payload["data"]["rooms"]:
-                self.room_map[room["id"]] = room
-            for lightGroup in payload["data"]["lightsSubgroups"]:
-                self.light_group_map[lightGroup["id"]] = lightGroup
-            self.room_map[0] = {"id": 0, "name": "全屋", "icon": 1}
-            self.light_group_map[0] = {"id": 0, "name": "所有灯", "icon": 1}
-            for key, value in self.room_map.items():
-                registry.async_get_or_create(value.get("name"))
-
-        # elif topic.endswith("p31"):
-        #   """Relationship data for rooms and groups"""
-        #   self.room_list = []
-        #    for room in payload["data"]:
-        #        room_id = room["room"]
-        #        self.room_list.append(room_id)
-        #    await self.sync_group_status(True)
-        elif topic.endswith("p55"):
-            reversed_dict = {value: key for key, value in self.media_player_sn.items()}
+        for state in stats_list:
+            if any(key in state for key in string_light_filter):
+                flag = True
+                await self._exec_event_3(state)
 
-            async_dispatcher_send(
-                self.hass,
-                EVENT_ENTITY_STATE_UPDATE.format(reversed_dict[payload["seq"]]),
-                payload["data"],
-            )
-        elif topic.endswith("p82"):
-            tmp_lights = {}
-            room_map = self.room_map
-            light_group_map = self.light_group_map
-            seq = payload["seq"]
-            if seq == 1 or seq == 2:
-                for roomObj in payload["data"]:
-                    if "a7" in roomObj:
-                        room_id = roomObj["a8"]
-
-                        tmp_lights["on"] = roomObj["a10"]
-
-                        tmp_lights["level"] = roomObj["a11"]
-                        if "a12" in roomObj:
-                            tmp_lights["kelvin"] = roomObj["a12"]
-
-                        if "a13" in roomObj:
-                            tmp_lights["rgb"] = roomObj["a13"]
-
-                        lights = tmp_lights
-                        room_name = room_map.get(room_id, {}).get("name", "未知房间")
-                        light_group_id = roomObj["a9"]
-                        light_group_name = light_group_map.get(light_group_id, {}).get(
-                            "name", "未知灯组"
-                        )
-                        await self._init_or_update_light_group(
-                            seq,
-                            room_id,
-                            room_name,
-                            light_group_id,
-                            light_group_name,
-                            lights,
-                        )
+            elif any(key in state for key in string_filter):
+                await self._exec_event_3(state)
+            else:
+                sns.append(state["sn"])
+
+            if "workingTime" in state or "powerSavings" in state:
+                for key in state.keys():
+                    if key not in string_array:
+                        flag = True
+
+        if sns:
+            self.request_state_lookup(sns)
+
+        if flag:
+            self.request_group_refresh()
 
+    @callback
+    def request_state_lookup(self, sns: list) -> None:
+        """Query the full state (q5) of devices that reported without it.
+
+        sns are collected for STATE_LOOKUP_WINDOW seconds and queried with as
+        few pages as possible. A sn queried less than STATE_LOOKUP_COOLDOWN
+        seconds ago is skipped.
         """
-        elif topic.endswith("p51"):
-            seq = payload["seq"]
+        now = time.monotonic()
+        for sn in sns:
+            last = self._state_lookup_times.get(sn)
+            if last is not None and now - last < STATE_LOOKUP_COOLDOWN:
+                self.state_lookup_stats["skipped"] += 1
+                continue
+            self._state_lookup_pending[sn] = None
+        if self._state_lookup_pending and self._state_lookup_handle is None:
+            self._state_lookup_handle = self.hass.loop.call_later(
+                STATE_LOOKUP_WINDOW, self._async_fire_state_lookup
+            )
 
-            #gu
-            _LOGGER.warning("p51 seq: %s", payload)
+    @callback
+    def _async_fire_state_lookup(self) -> None:
+        sns = list(self._state_lookup_pending)
+        self._state_lookup_pending.clear()
+        self._state_lookup_handle = None
+
+        now = time.monotonic()
+        times = self._state_lookup_times
+        # Entries are kept in query order, forget the ones past the cooldown
+        while times and now - next(iter(times.values())) >= STATE_LOOKUP_COOLDOWN:
+            del times[next(iter(times))]
+        for sn in sns:
+            times.pop(sn, None)
+            times[sn] = now
+
+        self.state_lookup_stats["sns"] += len(sns)
+        for start in range(0, len(sns), DEVICE_COUNT_MAX):
+            data = {
+                "start": 0,
+                "max": DEVICE_COUNT_MAX,
+                "sns": sns[start:start + DEVICE_COUNT_MAX],
+            }
+            self.hass.async_create_task(
+                self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q5", data, STATE_LOOKUP_SEQ)
+            )
 
+    @property
+    def q5_requests_last_minute(self) -> int:
+        """Number of q5 requests sent during the last 60 seconds"""
+        times = self._q5_request_times
+        now = time.monotonic()
+        while times and now - times[0] > 60:
+            times.popleft()
+        return len(times)
+
+    async def _async_on_event_4(self, topic: str, payload: dict) -> None:
+        """Device event, only logged"""
+        _LOGGER.debug(f"event/4 data:{payload}")
+
+    async def _async_on_report(self, topic: str, payload: dict) -> None:
+        """report/q5 and report/q7, shown as a persistent notification"""
+        _LOGGER.debug(f"report/q5:{payload}")
+        # payload["timestamp"] = timestamp.isoformat()
+        message = json.dumps(payload, ensure_ascii=False, indent=4)
+        await self.hass.services.async_call(
+            "persistent_notification",
+            "create",
+            {"title": topic, "message": message, "notification_id": topic},
+            blocking=True,
+        )
+
+    async def _async_on_log_report(self, topic: str, payload: dict) -> None:
+        """Gateway log report, fired on the event bus"""
+        payload = self.log_data(payload)
+        log_data = payload["data"].get("list")
+        # _LOGGER.warning(f"！！！！report/q8:{log_data}")
+        for item in log_data:
+            self.hass.bus.async_fire(LOG_REPORT_Q8, item)
+
+    async def _async_on_group_state(self, topic: str, payload: dict) -> None:
+        """Light group state data"""
+        group_list = payload["data"]
+        _LOGGER.debug(f"event/5 data:{payload}")
+        for group in group_list:
+            if "a7" in group and "a8" in group and "a9" in group:
+                device_type = group["a7"]
+                room_id = group["a8"]
+                group_id = group["a9"]
+                data = {}
+                if "a10" in group:
+                    data["on"] = group["a10"]
+                if "a11" in group:
+                    data["level"] = group["a11"]
+                if "a12" in group:
+                    data["kelvin"] = group["a12"]
+                if "a13" in group and group["a13"] != 0:
+                    data["rgb"] = group["a13"]
+                if device_type == 1 and data:
+                    await self._init_or_update_light_group(
+                        2, room_id, "", group_id, "", data
+                    )
 
+    async def _async_on_basic_data(self, topic: str, payload: dict) -> None:
+        """Basic data, including room information, light group information, curtain group information"""
+        registry = ar.async_get(self.hass)
+
+        for room in payload["data"]["rooms"]:
+            self.room_map[room["id"]] = room
+        for lightGroup in payload["data"]["lightsSubgroups"]:
+            self.light_group_map[lightGroup["id"]] = lightGroup
+        self.room_map[0] = {"id": 0, "name": "全屋", "icon": 1}
+        self.light_group_map[0] = {"id": 0, "name": "所有灯", "icon": 1}
+        for key, value in self.room_map.items():
+            registry.async_get_or_create(value.get("name"))
+
+    # elif topic.endswith("p31"):
+    #   """Relationship data for rooms and groups"""
+    #   self.room_list = []
+    #    for room in payload["data"]:
+    #        room_id = room["room"]
+    #        self.room_list.append(room_id)
+    #    await self.sync_group_status(True)
+
+    async def _async_on_media_player_state(self, topic: str, payload: dict) -> None:
+        """Media player state, the seq is the player's request number"""
+        reversed_dict = {value: key for key, value in self.media_player_sn.items()}
+
+        self.state_router.async_dispatch(reversed_dict[payload["seq"]], payload["data"])
+
+    async def _async_on_light_group_status(self, topic: str, payload: dict) -> None:
+        """Room light group status (p82)"""
+        tmp_lights = {}
+        room_map = self.room_map
+        light_group_map = self.light_group_map
+        seq = payload["seq"]
+        if seq == 1 or seq == 2:
             for roomObj in payload["data"]:
-                if "lights" in roomObj:
-                    room_id = roomObj["id"]
-                    lights = roomObj["lights"]
-                    room_name = roomObj["name"]
-                    light_group_id = 0
-                    light_group_name = "所有灯"
-                    await self._init_or_update_light_group(seq, room_id, room_name, light_group_id,
-                                                           light_group_name, lights)
-                    if "subgroups" in lights:
-                        for subgroupObj in lights["subgroups"]:
-                            light_group_id = int(subgroupObj["id"])
-                            light_group_name = subgroupObj["name"]
-                            await self._init_or_update_light_group(seq, room_id, room_name, light_group_id,
-                                                                   light_group_name, subgroupObj)
-        """
+                if "a7" in roomObj:
+                    room_id = roomObj["a8"]
 
-    async def _exec_event_3(self, data):
-        _LOGGER.debug(f"exec_event_3  {data}")
-        if "relays" in data:
-            for relay, is_on in enumerate(data["relays"]):
-                status = {"on": is_on}
-                async_dispatcher_send(
-                    self.hass,
-                    EVENT_ENTITY_STATE_UPDATE.format(f"switch{data['sn']}{relay}"),
-                    status,
-                )
-        # 恒温多实体触发
-        elif "devType" in data:
+                    tmp_lights["on"] = roomObj["a10"]
 
-            if data["devType"] == 9:
+                    tmp_lights["level"] = roomObj["a11"]
+                    if "a12" in roomObj:
+                        tmp_lights["kelvin"] = roomObj["a12"]
 
-                # data.pop('a19',None)
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"]), data
-                )
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "H"), data
-                )
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "F"), data
-                )
-            elif data["devType"] == 16:
-                for i, inputname in enumerate(INPUT_SCHEMA, start=1):
-                    async_dispatcher_send(
-                        self.hass,
-                        EVENT_ENTITY_STATE_UPDATE.format(f"{data['sn']}_{inputname}"),
-                        data,
+                    if "a13" in roomObj:
+                        tmp_lights["rgb"] = roomObj["a13"]
+
+                    lights = tmp_lights
+                    room_name = room_map.get(room_id, {}).get("name", "未知房间")
+                    light_group_id = roomObj["a9"]
+                    light_group_name = light_group_map.get(light_group_id, {}).get(
+                        "name", "未知灯组"
+                    )
+                    await self._init_or_update_light_group(
+                        seq,
+                        room_id,
+                        room_name,
+                        light_group_id,
+                        light_group_name,
+                        lights,
                     )
 
-            elif data["devType"] == 7:
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "L"), data
-                )
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "M"), data
-                )
-            elif data["devType"] == 20:
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"]), data
-                )
+    """
+    elif topic.endswith("p51"):
+        seq = payload["seq"]
+
+        #gu
+        _LOGGER.warning("p51 seq: %s", payload)
+
+
+        for roomObj in payload["data"]:
+            if "lights" in roomObj:
+                room_id = roomObj["id"]
+                lights = roomObj["lights"]
+                room_name = roomObj["name"]
+                light_group_id = 0
+                light_group_name = "所有灯"
+                await self._init_or_update_light_group(seq, room_id, room_name, light_group_id,
+                                                       light_group_name, lights)
+                if "subgroups" in lights:
+                    for subgroupObj in lights["subgroups"]:
+                        light_group_id = int(subgroupObj["id"])
+                        light_group_name = subgroupObj["name"]
+                        await self._init_or_update_light_group(seq, room_id, room_name, light_group_id,
+                                                               light_group_name, subgroupObj)
+    """
+
+    def _state_changes(self, key: str, state: dict) -> tuple[dict, dict] | None:
+        """Return the changed fields of a state and the previous state, None if nothing changed"""
+        now = time.monotonic()
+        cached = self._last_states.get(key)
+        if cached is None or now - cached[0] > STATE_CACHE_TTL:
+            previous = {}
+        else:
+            previous = cached[1]
+        changed = {
+            field: value
+            for field, value in state.items()
+            if field not in previous or previous[field] != value
+        }
+        if not changed:
+            self.state_stats["suppressed"] += 1
+            return None
+        self.state_stats["forwarded"] += 1
+        self._last_states[key] = (now, {**previous, **state})
+        return changed, previous
+
+    @callback
+    def invalidate_state(self, key: str) -> None:
+        """Forward the next state of a device even if it equals the last one.
+
+        Called when a command is sent to the device: the entity may show an
+        optimistic value, the report after a failed command must correct it.
+        """
+        self._last_states.pop(key, None)
 
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "V"), data
-                )
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "C"), data
-                )
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "E"), data
-                )
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "P"), data
-                )
-            else:
-                async_dispatcher_send(
-                    self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"]), data
+    async def _exec_event_3(self, data):
+        _LOGGER.debug(f"exec_event_3  {data}")
+        if (changes := self._state_changes(data["sn"], data)) is None:
+            return
+        state = {**changes[0], "sn": data["sn"]}
+        # Each entity is sent the changed fields it reads, the others are not woken
+        for key, fields in self._fanout_route(data):
+            if fields is None:
+                self.state_router.async_dispatch(key, state)
+            elif any(field in state for field in fields):
+                self.state_router.async_dispatch(
+                    key, {field: state[field] for field in fields if field in state}
                 )
-        elif "a109" in data:
-            async_dispatcher_send(
-                self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"]), data
-            )
-            async_dispatcher_send(
-                self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "H"), data
-            )
-            async_dispatcher_send(
-                self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "F"), data
-            )
 
+    def _compile_fanout_route(self, sn: str, dev_type) -> tuple:
+        """Compile and keep the (route key, fields or None for all) of every entity of a device"""
+        route = self._fanout_routes[sn] = tuple(
+            (f"{sn}{suffix}", fields)
+            for suffix, fields in FANOUT_TABLE.get(dev_type, DEFAULT_FANOUT)
+        )
+        return route
+
+    def _fanout_route(self, data: dict) -> tuple:
+        """Return the fan-out route of the device a state belongs to"""
+        sn = data["sn"]
+        if (route := self._fanout_routes.get(sn)) is not None:
+            return route
+        if "devType" in data:
+            return self._compile_fanout_route(sn, data["devType"])
+        # Device not registered yet, guess its entities from the reported fields
+        if "a109" in data:
+            suffixes = ("", "H", "F")
         elif "a15" in data:
-            async_dispatcher_send(
-                self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "L"), data
-            )
-            async_dispatcher_send(
-                self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"] + "M"), data
-            )
-
+            suffixes = ("L", "M")
         else:
-            async_dispatcher_send(
-                self.hass, EVENT_ENTITY_STATE_UPDATE.format(data["sn"]), data
-            )
+            suffixes = ("",)
+        return tuple((f"{sn}{suffix}", None) for suffix in suffixes)
 
     async def _init_or_update_light_group(
         self,
@@ -698,7 +1029,8 @@ class Gateway:
                 "name": f"{room_name}-{light_group_name}",
             }
             group = dict(light_group, **group)
-            await self._add_entity("light", group)
+            if not await self._add_entity("light", group):
+                await self._event_trigger(room_id, light_group_id, light_group)
         else:
             await self._event_trigger(room_id, light_group_id, light_group)
 
@@ -712,9 +1044,10 @@ class Gateway:
             state["kelvin"] = int(device["kelvin"])
         if "rgb" in device:
             state["rgb"] = int(device["rgb"])
-        async_dispatcher_send(
-            self.hass, EVENT_ENTITY_STATE_UPDATE.format(f"{room}-{subgroup}"), state
-        )
+        if (changes := self._state_changes(f"{room}-{subgroup}", state)) is None:
+            return
+        state = changes[0]
+        self.state_router.async_dispatch(f"{room}-{subgroup}", state)
 
     async def sync_group_status(self, is_init: bool):
 
@@ -732,24 +1065,166 @@ class Gateway:
         _LOGGER.debug("sync_group_status")
 
         if is_init:
-            await self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q82", data, 1)
+            await self.async_request("q82", data, 1)
             # await self._async_mqtt_publish("P/0/center/q51", data, 1)
         else:
-            # 延迟15s 刷新
-            await asyncio.sleep(15)
-            await self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q82", data, 2)
+            self.request_group_refresh()
         # await self._async_mqtt_publish("P/0/center/q51", data, 2)
 
-    async def _add_entity(self, component: str, device: dict):
-        """Add child device information"""
-        async_dispatcher_send(
-            self.hass, EVENT_ENTITY_REGISTER.format(component), device
+    @callback
+    def request_group_refresh(self) -> None:
+        """Refresh light group states (q82) once a burst of light events settles.
+
+        Requests are merged until none came for GROUP_REFRESH_DEBOUNCE seconds,
+        at most GROUP_REFRESH_MAX_WAIT seconds after the first one.
+        """
+        loop = self.hass.loop
+        now = loop.time()
+        if self._group_refresh_handle is None:
+            self._group_refresh_first = now
+        else:
+            self._group_refresh_handle.cancel()
+        self._group_refresh_handle = loop.call_at(
+            min(now + GROUP_REFRESH_DEBOUNCE, self._group_refresh_first + GROUP_REFRESH_MAX_WAIT),
+            self._async_fire_group_refresh,
         )
 
-    async def init(self, entry: ConfigEntry, is_init: bool):
-        """Initialize the gateway business logic, including subscribing to device data, scene data, and basic data,
-        and sending data reporting instructions to the gateway"""
-        self._entry = entry
+    @callback
+    def _async_fire_group_refresh(self) -> None:
+        self._group_refresh_handle = None
+        data = [{"a7": 1}]
+        self.hass.async_create_task(
+            self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q82", data, 2)
+        )
+
+    async def _add_entity(self, component: str, device: dict) -> bool:
+        """Add child device information, return False if the entity already exists"""
+        known = self._known_entities.get(f"{component}/{device['unique_id']}")
+        self._remember_entity(component, device)
+        if known is None:
+            async_dispatcher_send(
+                self.hass, EVENT_ENTITY_REGISTER.format(component, self._entry.entry_id), device
+            )
+            return True
+        if component != "scene" and any(
+            known["device"].get(field) != device.get(field) for field in DEVICE_INFO_FIELDS
+        ):
+            self._update_device_info(device)
+        return False
+
+    def _remember_entity(self, component: str, device: dict) -> None:
+        """Record an entity of the live topology"""
+        # A copy, the platforms may still change the dispatched dict
+        entity = {"component": component, "device": copy.deepcopy(device)}
+        key = f"{component}/{device['unique_id']}"
+        self._live_entities[key] = entity
+        self._known_entities[key] = entity
+        if "sn" in device:
+            self._known_sns.add(device["sn"])
+
+    def _update_device_info(self, device: dict) -> None:
+        """Rename an existing device in the device registry"""
+        registry = dr.async_get(self.hass)
+        identifier = (DOMAIN, str(device.get("sn", device["unique_id"])))
+        if (device_entry := registry.async_get_device(identifiers={identifier})) is None:
+            return
+        changes = {field: device[field] for field in DEVICE_INFO_FIELDS if field in device}
+        _LOGGER.warning("设备信息已变更 %s: %s", identifier[1], changes)
+        registry.async_update_device(device_entry.id, **changes)
+
+    async def _async_mark_removed(self, removed: list[dict]) -> None:
+        """Mark entities the gateway no longer reports unavailable"""
+        # Devices with an entity still reported stay available
+        live_sns = {
+            entity["device"]["sn"]
+            for entity in self._live_entities.values()
+            if "sn" in entity["device"]
+        }
+        removed_sns = set()
+        for entity in removed:
+            device = entity["device"]
+            if entity["component"] == "scene" or "sn" not in device:
+                continue
+            if device["sn"] in live_sns or device["sn"] in removed_sns:
+                continue
+            removed_sns.add(device["sn"])
+            await self._exec_event_3({**device, "state": 0})
+        self._known_sns -= removed_sns
+        if removed:
+            _LOGGER.warning("网关不再上报 %s 个实体，已标记为不可用", len(removed))
+
+    def is_known_device(self, identifier: str) -> bool:
+        """Return True if an entity of the gateway topology belongs to the device"""
+        return identifier in self._known_sns or any(
+            entity["device"]["unique_id"] == identifier
+            for entity in self._known_entities.values()
+        )
+
+    async def async_restore_topology(self) -> None:
+        """Create entities from the last saved topology, before the gateway answers"""
+        data = await self._topology_store.async_load()
+        if not data:
+            return
+        # JSON object keys are strings, the maps are keyed by int id
+        self.room_map.update({room["id"]: room for room in data["rooms"]})
+        self.light_group_map.update({group["id"]: group for group in data["light_groups"]})
+        self.scene_map.update({scene_id: name for scene_id, name in data["scenes"]})
+        self.task_automation_map.update(
+            {automation_id: name for automation_id, name in data["automations"]}
+        )
+        self.device_map.update(data["device_map"])
+        self.media_player_sn.update(data["media_players"])
+        if self.media_player_sn:
+            self.n_tmp = max(self.n_tmp, max(self.media_player_sn.values()) + 1)
+
+        for key, entity in data["entities"].items():
+            if key in self._known_entities:
+                continue
+            self._known_entities[key] = entity
+            if "sn" in entity["device"]:
+                self._known_sns.add(entity["device"]["sn"])
+                if "devType" in entity["device"]:
+                    self._compile_fanout_route(
+                        entity["device"]["sn"], entity["device"]["devType"]
+                    )
+            async_dispatcher_send(
+                self.hass,
+                EVENT_ENTITY_REGISTER.format(entity["component"], self._entry.entry_id),
+                copy.deepcopy(entity["device"]),
+            )
+            self.restored_entity_count += 1
+        _LOGGER.warning("从缓存恢复了 %s 个实体", self.restored_entity_count)
+
+    async def _async_reconcile_topology(self, complete: bool) -> None:
+        """Reconcile the known entities with the sync that just finished and save them.
+
+        Entities missing from a complete sync are marked unavailable and
+        forgotten, after a sync where some request timed out nothing is dropped.
+        """
+        if complete:
+            removed = [
+                self._known_entities.pop(key)
+                for key in list(self._known_entities)
+                if key not in self._live_entities
+            ]
+            await self._async_mark_removed(removed)
+        self._live_entities = {}
+        self._topology_store.async_delay_save(self._topology_data, TOPOLOGY_SAVE_DELAY)
+
+    @callback
+    def _topology_data(self) -> dict:
+        return {
+            "rooms": list(self.room_map.values()),
+            "light_groups": list(self.light_group_map.values()),
+            "scenes": list(self.scene_map.items()),
+            "automations": list(self.task_automation_map.items()),
+            "device_map": self.device_map,
+            "media_players": self.media_player_sn,
+            "entities": self._known_entities,
+        }
+
+    def _discovery_topics(self) -> list[str]:
+        """Return the topics init subscribes to, none covered by another one"""
         discovery_topics = [
             # Subscribe to device list
             f"{MQTT_TOPIC_PREFIX}/{self.mqttAddr}/center/p5",
@@ -778,6 +1253,14 @@ class Gateway:
             discovery_topics.append("p/+/event/3")
         elif CONF_CERTIFICATE in self._entry.data:
             discovery_topics.append(f"p/{self.mqttAddr}/report/q8")
+        # p/+/event/3 may cover p/{mqttAddr1}/event/3, subscribe to each topic once
+        return reduce_topic_filters(discovery_topics)
+
+    async def init(self, entry: ConfigEntry, is_init: bool):
+        """Initialize the gateway business logic, including subscribing to device data, scene data, and basic data,
+        and sending data reporting instructions to the gateway"""
+        self._entry = entry
+        discovery_topics = self._discovery_topics()
 
         # for subscribe_topic in discovery_topics:
         #  self.hass.data[TEMP_MQTT_TOPIC_PREFIX][subscribe_topic] = True
@@ -791,13 +1274,13 @@ class Gateway:
         else:
             _LOGGER.warning("没有重新连接mqtt--------------------------------------")
 
-        mqtt_connected = self.hass.data[MQTT_CLIENT_INSTANCE].connected
+        mqtt_connected = self.mqtt_client.connected
 
         while not mqtt_connected:
 
             # await self.reconnect(entry)
             await asyncio.sleep(3)
-            mqtt_connected = self.hass.data[MQTT_CLIENT_INSTANCE].connected
+            mqtt_connected = self.mqtt_client.connected
 
             _LOGGER.warning("is_init 1 %s mqtt_connected %s", is_init, mqtt_connected)
             try_connect_times = try_connect_times - 1
@@ -838,49 +1321,52 @@ class Gateway:
             self.init_state = True
             try:
                 if is_init:
-
-                    await asyncio.gather(
-                        *(
-                            self.hass.data[MQTT_CLIENT_INSTANCE].async_subscribe(
-                                topic, self._async_mqtt_subscribe, 0, "utf-8"
-                            )
-                            for topic in discovery_topics
-                        )
+                    _, granted = await self.mqtt_client.async_subscribe_bulk(
+                        discovery_topics,
+                        {topic: self._topic_callback(topic) for topic in discovery_topics},
+                        0,
+                        None,
                     )
-                # publish payload to get all basic data Room list, light group list, curtain group list
-                await self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q33", {})
-                await asyncio.sleep(3)
-                # publish payload to get device list
-                data = {
-                    "start": 0,
-                    "max": DEVICE_COUNT_MAX,
-                    "devTypes": self.devTypes,
-                }
-                await self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q5", data, 1)
-                await asyncio.sleep(3)
-                # publish payload to get scene list
-                await self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q28", {})
-                await asyncio.sleep(3)
-                await self._async_mqtt_publish(f"P/{self.mqttAddr}/center/q71", {})
-
-                # await asyncio.sleep(1)
+                    if refused := [topic for topic, qos in granted.items() if qos >= 0x80]:
+                        _LOGGER.warning("订阅失败的主题: %s", refused)
+                if self.topology_synced and self.mqtt_client.session_present:
+                    # The broker resumed our session, rooms, devices and scenes are already
+                    # known. Event topics are subscribed at QoS 0 so the broker queued no
+                    # state changes meanwhile, refresh the states only (q5, q82)
+                    _LOGGER.warning("MQTT会话已恢复，只刷新设备状态")
+                    await self._async_fetch_device_list(
+                        {"devTypes": self.devTypes}, STATE_REFRESH_SEQ
+                    )
+                    if self.light_device_type == "group":
+                        await self.sync_group_status(True)
+                    return
+                started = time.monotonic()
+                timeouts = self._request_timeouts
+                self._live_entities = {}
+                # get all basic data Room list, light group list, curtain group list,
+                # devices and scenes are named after the rooms
+                await self.async_request("q33", {})
+                # device list, scene list and task automation list are independent
+                await asyncio.gather(
+                    self._async_fetch_device_list({"devTypes": self.devTypes}, 1),
+                    self.async_request("q28", {}),
+                    self.async_request("q71", {}),
+                )
 
                 if self.light_device_type == "group":
-                    # publish payload to get room and light group relationship
-                    await asyncio.sleep(5)
+                    # get room and light group relationship
                     await self.sync_group_status(True)
 
                     # await self._async_mqtt_publish("P/0/center/q31", {})
-                await asyncio.sleep(10)
                 if self.sns:
-                    data = {
-                        "start": 0,
-                        "max": DEVICE_COUNT_MAX,
-                        "sns": self.sns,
-                    }
-                    await self._async_mqtt_publish(
-                        f"P/{self.mqttAddr}/center/q5", data, 2
-                    )
+                    # switches reported without relays, fetch their full state
+                    await self._async_fetch_device_list({"sns": self.sns}, 2)
+                complete = timeouts == self._request_timeouts
+                # A sync with a timed out request still needs the full init next time
+                self.topology_synced = complete
+                await self._async_reconcile_topology(complete=complete)
+                self.startup_duration = round(time.monotonic() - started, 3)
+                _LOGGER.warning("初始化数据完成，耗时 %s 秒", self.startup_duration)
             except OSError as err:
                 self.init_state = False
                 _LOGGER.error("出了一些问题: %s", err)
@@ -891,9 +1377,7 @@ class Gateway:
         return await self._async_mqtt_publish(topic, data, seq=n_id)
 
     async def mqtt_subscribe_custom(self, subscribe_topic) -> None:
-        self.unsubscribe_temp = await self.hass.data[
-            MQTT_CLIENT_INSTANCE
-        ].async_subscribe(
+        self.unsubscribe_temp = await self.mqtt_client.async_subscribe(
             subscribe_topic, self._async_mqtt_subscribe_custom, 0, "utf-8"
         )
         # await self.reconnect(self._entry)
@@ -908,7 +1392,7 @@ class Gateway:
 
                 store = Store(self.hass, 1, "test/model")
                 sns_tmp = await store.async_load() or []
-                payload = json.loads(payload)
+                payload = json_loads(payload)
                 seq = payload["seq"]
                 if seq == 4:
                     seq = topic
@@ -961,8 +1445,10 @@ class Gateway:
             "data": data,
         }
         # _LOGGER.warning("topic %s data %s", topic, query_device_payload)
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
-            topic, json.dumps(query_device_payload), 0, False
+        if topic.endswith("/q5"):
+            self._q5_request_times.append(time.monotonic())
+        await self.mqtt_client.async_publish(
+            topic, json_dumps(query_device_payload), 0, False
         )
 
     @property
@@ -9,13 +9,15 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant,ServiceResponse, SupportsResponse,ServiceCall
 from homeassistant.const import CONF_NAME, CONF_PASSWORD, CONF_ADDRESS
 from homeassistant.helpers import config_validation as cv, entity_platform, service
+from homeassistant.helpers import device_registry as dr
 from ipaddress import ip_network
 from .listener import sender_receiver
 from .Gateway import Gateway
 from .const import PLATFORMS, MQTT_CLIENT_INSTANCE, CONF_LIGHT_DEVICE_TYPE, DOMAIN, FLAG_IS_INITIALIZED, \
-    CACHE_ENTITY_STATE_UPDATE_KEY_DICT, CONF_BROKER, CONF_ENVKEY, CONF_PLACE,MQTT_TOPIC_PREFIX,TEMP_MQTT_TOPIC_PREFIX,LOG_REPORT_Q8
+    CONF_BROKER, CONF_ENVKEY, CONF_PLACE,MQTT_TOPIC_PREFIX,TEMP_MQTT_TOPIC_PREFIX,LOG_REPORT_Q8
 from .mdns import MdnsScanner
 from .http_get import HttpRequest
+from .topology import TopologyStore
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,12 +33,12 @@ async def _async_config_entry_updated(hass: HomeAssistant, entry: ConfigEntry) -
     _LOGGER.debug(f"_async_config_entry_updated {entry.data}")
     
     hub : Gateway= hass.data[DOMAIN][entry.entry_id]
-    mqtt_client = hass.data[MQTT_CLIENT_INSTANCE]
+    hub.mqtt_client.configure_inbound(**hub.inbound_options())
+    # Options are read live, only a change of the connection data reconnects
+    if dict(entry.data) == hub.entry_data:
+        return
     #await mqtt_client.async_disconnect()
-    hub.reconnect_flag = True
-    hass.async_create_task(
-        hub.init(entry, True)
-    )
+    hub.async_reinit(entry)
 
     
 async def _async_reload_config_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
@@ -59,9 +61,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = hub
 
-    # 初始化标记和实体状态更新键字典
+    # 初始化标记
     hass.data.setdefault(FLAG_IS_INITIALIZED, False)
-    hass.data.setdefault(CACHE_ENTITY_STATE_UPDATE_KEY_DICT, {})
     hass.data.setdefault(TEMP_MQTT_TOPIC_PREFIX, {})
 
     # 如果尚未初始化，则进行初始化操作
@@ -71,6 +72,9 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     else:
         await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    # 先用缓存的拓扑创建实体，网关应答后在后台校正
+    await hub.async_restore_topology()
+
     # 启用重连标志
     hub.reconnect_flag = True
 
@@ -237,7 +241,7 @@ async def monitor_connection(hass:HomeAssistant, hub:Gateway,entry:ConfigEntry):
 
             # 检查MQTT连接状态
 
-            mqtt_connected = hub.hass.data[MQTT_CLIENT_INSTANCE].connected
+            mqtt_connected = hub.mqtt_client.connected
             current_time = int(time.time())
             
 
@@ -285,7 +289,7 @@ async def monitor_connection(hass:HomeAssistant, hub:Gateway,entry:ConfigEntry):
                 # 如果没扫描到设备，但是MQTT已连接，则尝试重新初始化网关
                 elif connection is None and mqtt_connected and not hub.init_state:
                     _LOGGER.warning("没扫描到设备，但是MQTT已连接")
-                    await _async_config_entry_updated(hass, entry)
+                    hub.async_reinit(entry)
                     #break
                     
 
@@ -328,7 +332,22 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     hass.data[DOMAIN].pop(entry.entry_id)
 
-    hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT] = {}
+    hass.data[MQTT_CLIENT_INSTANCE].pop(entry.entry_id, None)
 
     return True
- 
\ No newline at end of file
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """删除配置项时，一并删除缓存的拓扑。"""
+    await TopologyStore(hass, entry.entry_id).async_remove()
+
+
+async def async_remove_config_entry_device(
+        hass: HomeAssistant, config_entry: ConfigEntry, device_entry: dr.DeviceEntry
+) -> bool:
+    """只允许删除网关已不再上报的设备。"""
+    hub: Gateway = hass.data[DOMAIN][config_entry.entry_id]
+    return not any(
+        domain == DOMAIN and hub.is_known_device(identifier)
+        for domain, identifier in device_entry.identifiers
+    )
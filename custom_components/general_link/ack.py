@@ -0,0 +1,119 @@
+"""Track broker ACKs of outgoing MQTT packets by message id."""
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+
+# Upper bounds in seconds of the ACK wait histogram buckets
+ACK_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Seconds the ACK of a not yet registered message id is kept for its register
+EARLY_ACK_TTL = 1.0
+
+
+class AckTracker:
+    """One future per outstanding message id, resolved by the ACK callback.
+
+    A mid is registered after its packet is handed to paho. With paho's
+    network thread the ACK can reach the event loop before the register call
+    queued by the executor job, such an early ACK is kept for early_ack_ttl
+    seconds and resolves the mid once it is registered. ACKs arriving after
+    the wait timed out are ignored: paho reuses mids, so a stale resolved
+    future would answer a later packet. Every method must be called from the
+    event loop.
+    """
+
+    def __init__(
+            self, loop: asyncio.AbstractEventLoop, early_ack_ttl: float = EARLY_ACK_TTL
+    ) -> None:
+        self._loop = loop
+        self._early_ack_ttl = early_ack_ttl
+        self._pending: dict[int, asyncio.Future[None]] = {}
+        # Loop time of ACKs received before their mid was registered
+        self._early: dict[int, float] = {}
+        # Mids whose wait timed out, until their late ACK or their reuse
+        self._timed_out: set[int] = set()
+        # Count of waits per bucket, the last bucket holds slower ACKs
+        self._histogram = [0] * (len(ACK_WAIT_BUCKETS) + 1)
+        self.timeouts = 0
+        self.unexpected = 0
+        self.early = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _future(self, mid: int) -> asyncio.Future[None]:
+        if (future := self._pending.get(mid)) is None:
+            future = self._pending[mid] = self._loop.create_future()
+            self._timed_out.discard(mid)
+            if (acked := self._early.pop(mid, None)) is not None:
+                if self._loop.time() - acked <= self._early_ack_ttl:
+                    self.early += 1
+                    future.set_result(None)
+                else:
+                    self.unexpected += 1
+        return future
+
+    def register(self, mid: int) -> None:
+        """Expect an ACK for a message id."""
+        self._future(mid)
+
+    def ack(self, mid: int) -> None:
+        """Resolve the waiter of a message id, or keep the ACK for its register."""
+        if (future := self._pending.get(mid)) is not None:
+            if not future.done():
+                future.set_result(None)
+            return
+        if mid in self._timed_out:
+            self._timed_out.discard(mid)
+            self.unexpected += 1
+            return
+        now = self._loop.time()
+        self._prune_early_acks(now)
+        self._early.pop(mid, None)
+        self._early[mid] = now
+
+    def _prune_early_acks(self, now: float) -> None:
+        """Drop early ACKs whose mid was not registered in time, oldest first."""
+        while self._early:
+            mid, acked = next(iter(self._early.items()))
+            if now - acked <= self._early_ack_ttl:
+                return
+            del self._early[mid]
+            self.unexpected += 1
+
+    async def async_wait(self, mid: int, timeout: float) -> None:
+        """Wait for the ACK of a message id, raise asyncio.TimeoutError on timeout."""
+        future = self._future(mid)
+        start = self._loop.time()
+        try:
+            if not future.done():
+                await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._timed_out.add(mid)
+            raise
+        else:
+            elapsed = self._loop.time() - start
+            self._histogram[bisect_left(ACK_WAIT_BUCKETS, elapsed)] += 1
+        finally:
+            if self._pending.get(mid) is future:
+                del self._pending[mid]
+
+    async def async_drain(self, timeout: float) -> None:
+        """Wait until every outstanding ACK arrived or the timeout passed."""
+        if pending := [future for future in self._pending.values() if not future.done()]:
+            await asyncio.wait(pending, timeout=timeout)
+
+    @property
+    def stats(self) -> dict[str, object]:
+        """Outstanding, early and unexpected ACKs, timeouts and the wait histogram."""
+        labels = [f"<={bound}s" for bound in ACK_WAIT_BUCKETS]
+        labels.append(f">{ACK_WAIT_BUCKETS[-1]}s")
+        return {
+            "outstanding": len(self._pending),
+            "timeouts": self.timeouts,
+            "unexpected": self.unexpected,
+            "early": self.early,
+            "wait_histogram": dict(zip(labels, self._histogram)),
+        }
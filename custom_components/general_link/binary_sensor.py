@@ -1,12 +1,13 @@
 import logging
 from homeassistant.components.binary_sensor import BinarySensorEntity, BinarySensorDeviceClass
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, EVENT_ENTITY_REGISTER, EVENT_ENTITY_STATE_UPDATE, CACHE_ENTITY_STATE_UPDATE_KEY_DICT, MANUFACTURER
+from .const import DOMAIN, EVENT_ENTITY_REGISTER, MANUFACTURER
+from .entity import GeneralLinkEntity
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,23 +30,26 @@ async def async_setup_entry(
                 name = config_payload['name']
                
                 for i, inputname in enumerate(INPUT_SCHEMA,start=1):
-                   config_payload['unique_id'] = f"{unique_id}_{inputname}"
-                   config_payload['name'] = f"{name}_{i}"
-                   config_payload['inputname'] = inputname
+                   input_payload = {
+                       **config_payload,
+                       'unique_id': f"{unique_id}_{inputname}",
+                       'name': f"{name}_{i}",
+                       'inputname': inputname,
+                   }
                    
-                   async_add_entities([MotionA100Sensor(hass, config_payload, config_entry)])
+                   async_add_entities([MotionA100Sensor(hass, input_payload, config_entry)])
 
         except Exception :
             raise
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
 
 
-class MotionSensor(BinarySensorEntity):
+class MotionSensor(GeneralLinkEntity, BinarySensorEntity):
     """用于处理占用传感器相关的业务逻辑的自定义实体类"""
 
     should_poll = False
@@ -63,21 +67,6 @@ class MotionSensor(BinarySensorEntity):
         self.config_entry = config_entry
         self.update_state(config)
 
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception as e:
-            _LOGGER.error(f"更新传感器状态时出错: {e}")
     def update_state(self, data) -> None:
         if "state" in data:
             if data["state"] == 1:
@@ -99,6 +88,7 @@ class MotionSensor(BinarySensorEntity):
 class MotionA15Sensor(MotionSensor):
     """用于处理占用传感器相关的业务逻辑的自定义实体类"""
     device_class = BinarySensorDeviceClass.MOTION
+    _route_suffix = "M"
 
     def __init__(self, hass: HomeAssistant, config: dict, config_entry: ConfigEntry) -> None:
         self._attr_unique_id = config["unique_id"] + "M"
@@ -121,6 +111,7 @@ class MotionA100Sensor(MotionSensor):
         self._attr_unique_id = config["unique_id"]
         self._attr_name = config["name"] 
         self._input = config["inputname"]
+        self._route_suffix = f"_{self._input}"
         self._attr_is_on = bool(config[self._input])
         super().__init__(hass, config, config_entry)
         
@@ -1,16 +1,16 @@
 
-import json
 import logging
 from abc import ABC
 from homeassistant.components.button import ButtonEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, MQTT_CLIENT_INSTANCE, \
-    EVENT_ENTITY_REGISTER, EVENT_ENTITY_STATE_UPDATE, CACHE_ENTITY_STATE_UPDATE_KEY_DICT, MANUFACTURER
+from .const import DOMAIN, EVENT_ENTITY_REGISTER, MANUFACTURER
+from .codec import json_dumps
+from .mqtt import get_mqtt_client
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -28,7 +28,7 @@ async def async_setup_entry(
         async_add_entities([RebootButton(hass, config_payload, config_entry)])
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
@@ -48,22 +48,6 @@ class RebootButton(ButtonEntity,ABC):
         self.config_entry = config_entry
         self.mqttAddr = config_entry.data.get("mqttAddr",0)
 
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            # 在这里可以处理按钮的状态更新
-            pass
-        except Exception as e:
-            _LOGGER.error(f"更新按钮状态时出错: {e}")
-
     @property
     def device_info(self) -> DeviceInfo:
         """关于此实体/设备的信息"""
@@ -96,9 +80,9 @@ class RebootButton(ButtonEntity,ABC):
             }
         }
         #message["data"]["sns"] = self.sn
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q57",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
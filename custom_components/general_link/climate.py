@@ -1,7 +1,6 @@
 """Business logic for climate entity."""
 from __future__ import annotations
 
-import json
 import logging
 from abc import ABC
 
@@ -10,13 +9,15 @@ from homeassistant.components.climate import ClimateEntity, HVACMode, ClimateEnt
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import UnitOfTemperature, PRECISION_WHOLE
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, MQTT_CLIENT_INSTANCE, EVENT_ENTITY_STATE_UPDATE, CACHE_ENTITY_STATE_UPDATE_KEY_DICT, \
-    EVENT_ENTITY_REGISTER, MANUFACTURER
+from .const import DOMAIN, EVENT_ENTITY_REGISTER, MANUFACTURER
+from .codec import json_dumps
+from .entity import GeneralLinkEntity
+from .mqtt import get_mqtt_client
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -54,13 +55,13 @@ async def async_setup_entry(
             raise
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
 
 
-class CustomClimate(ClimateEntity, ABC):
+class CustomClimate(GeneralLinkEntity, ClimateEntity, ABC):
     """Custom entity class to handle business logic related to climates"""
 
     should_poll = False
@@ -115,23 +116,9 @@ class CustomClimate(ClimateEntity, ABC):
 
         self.update_state(config)
 
-        """Add a device state change event listener, and execute the specified method when the device state changes. 
-        Note: It is necessary to determine whether an event listener has been added here to avoid repeated additions."""
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception:
-            raise
+    @property
+    def device_key(self) -> str:
+        return self._sn
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -272,18 +259,21 @@ class CustomClimate(ClimateEntity, ABC):
             }
         }
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        self.async_invalidate_state()
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q74",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
 
-class CustomClimateH(ClimateEntity, ABC):
+class CustomClimateH(GeneralLinkEntity, ClimateEntity, ABC):
     """Custom entity class to handle business logic related to climates"""
 
     should_poll = False
 
+    _route_suffix = "H"
+
     device_class = COMPONENT
 
     _attr_supported_features = ClimateEntityFeature.TARGET_TEMPERATURE
@@ -336,23 +326,9 @@ class CustomClimateH(ClimateEntity, ABC):
 
         self.update_state(config)
 
-        """Add a device state change event listener, and execute the specified method when the device state changes. 
-        Note: It is necessary to determine whether an event listener has been added here to avoid repeated additions."""
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception:
-            raise
+    @property
+    def device_key(self) -> str:
+        return self._sn
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -449,9 +425,10 @@ class CustomClimateH(ClimateEntity, ABC):
             }
         }
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        self.async_invalidate_state()
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q74",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
@@ -616,9 +593,10 @@ class CustomClimateW(CustomClimate):
              }
            }
 
-         await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+         self.async_invalidate_state()
+         await get_mqtt_client(self.hass, self.config_entry).async_publish(
              f"P/{self.mqttAddr}/center/q74",
-             json.dumps(message),
+             json_dumps(message),
              0,
              False
          )
@@ -0,0 +1,31 @@
+"""JSON codec for gateway payloads, orjson when installed, stdlib json otherwise."""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+if orjson is not None:
+
+    def json_loads(data: bytes | str) -> Any:
+        """Parse a JSON document, bytes are parsed without decoding them first."""
+        return orjson.loads(data)
+
+    def json_dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes, ready to hand to paho."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+else:
+
+    def json_loads(data: bytes | str) -> Any:
+        """Parse a JSON document, bytes are parsed without decoding them first."""
+        return json.loads(data)
+
+    def json_dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes, ready to hand to paho."""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
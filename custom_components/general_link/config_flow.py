@@ -30,7 +30,13 @@ from homeassistant.helpers.storage import Store
 from homeassistant.components.mqtt.const import CONF_CERTIFICATE
 from .mdns import MdnsScanner
 from .const import (
-    DOMAIN, CONF_BROKER, CONF_LIGHT_DEVICE_TYPE, CONF_ENVKEY, CONF_PLACE
+    DOMAIN, CONF_BROKER, CONF_LIGHT_DEVICE_TYPE, CONF_ENVKEY, CONF_PLACE,
+    CONF_SENSOR_MIN_INTERVAL, CONF_SENSOR_MAX_INTERVAL, CONF_SENSOR_ABS_DEADBAND, CONF_SENSOR_REL_DEADBAND,
+    DEFAULT_SENSOR_MIN_INTERVAL, DEFAULT_SENSOR_MAX_INTERVAL, DEFAULT_SENSOR_ABS_DEADBAND, DEFAULT_SENSOR_REL_DEADBAND,
+    CONF_INBOUND_MAX_SIZE, CONF_INBOUND_EVENT_POLICY, CONF_INBOUND_REPORT_POLICY
+)
+from .inbound import (
+    DEFAULT_INBOUND_MAX_SIZE, DEFAULT_INBOUND_POLICIES, POLICY_KEEP, POLICY_LATEST, POLICY_DROP_OLDEST
 )
 from .scan import scan_and_get_connection_dict
 from .util import format_connection
@@ -423,6 +429,8 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             step_id="init",
             menu_options=[
                 "user",
+                "sensor_throttle",
+                "inbound",
                 "modify_sync",
                 "destroy_sync",
             ],
@@ -432,7 +440,7 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         options = self._config_entry.options
         errors = {}
         if user_input is not None:
-            return self.async_create_entry(title='', data=user_input)
+            return self.async_create_entry(title='', data={**options, **user_input})
         
         media_states = self.hass.states.async_all('media_player')
         media_entities = []
@@ -456,6 +464,56 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         })
         return self.async_show_form(step_id="user", data_schema=DATA_SCHEMA, errors=errors)
 
+    async def async_step_sensor_throttle(self, user_input=None):
+        """Write rate and deadband of the energy meter sensors"""
+        options = self._config_entry.options
+        if user_input is not None:
+            if user_input[CONF_SENSOR_MAX_INTERVAL] < user_input[CONF_SENSOR_MIN_INTERVAL]:
+                user_input[CONF_SENSOR_MAX_INTERVAL] = user_input[CONF_SENSOR_MIN_INTERVAL]
+            return self.async_create_entry(title='', data={**options, **user_input})
+
+        DATA_SCHEMA = vol.Schema({
+            vol.Required(
+                CONF_SENSOR_MIN_INTERVAL,
+                default=options.get(CONF_SENSOR_MIN_INTERVAL, DEFAULT_SENSOR_MIN_INTERVAL),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Required(
+                CONF_SENSOR_MAX_INTERVAL,
+                default=options.get(CONF_SENSOR_MAX_INTERVAL, DEFAULT_SENSOR_MAX_INTERVAL),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Required(
+                CONF_SENSOR_ABS_DEADBAND,
+                default=options.get(CONF_SENSOR_ABS_DEADBAND, DEFAULT_SENSOR_ABS_DEADBAND),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            vol.Required(
+                CONF_SENSOR_REL_DEADBAND,
+                default=options.get(CONF_SENSOR_REL_DEADBAND, DEFAULT_SENSOR_REL_DEADBAND),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+        })
+        return self.async_show_form(step_id="sensor_throttle", data_schema=DATA_SCHEMA)
+
+    async def async_step_inbound(self, user_input=None):
+        """Bound and drop policies of the buffer of received messages"""
+        options = self._config_entry.options
+        if user_input is not None:
+            return self.async_create_entry(title='', data={**options, **user_input})
+
+        DATA_SCHEMA = vol.Schema({
+            vol.Required(
+                CONF_INBOUND_MAX_SIZE,
+                default=options.get(CONF_INBOUND_MAX_SIZE, DEFAULT_INBOUND_MAX_SIZE),
+            ): vol.All(vol.Coerce(int), vol.Range(min=100)),
+            vol.Required(
+                CONF_INBOUND_EVENT_POLICY,
+                default=options.get(CONF_INBOUND_EVENT_POLICY, DEFAULT_INBOUND_POLICIES["event/3"]),
+            ): vol.In([POLICY_LATEST, POLICY_DROP_OLDEST, POLICY_KEEP]),
+            vol.Required(
+                CONF_INBOUND_REPORT_POLICY,
+                default=options.get(CONF_INBOUND_REPORT_POLICY, DEFAULT_INBOUND_POLICIES["report/q8"]),
+            ): vol.In([POLICY_DROP_OLDEST, POLICY_KEEP]),
+        })
+        return self.async_show_form(step_id="inbound", data_schema=DATA_SCHEMA)
+
 
 def try_connection(hass, broker, port, username, password, protocol="3.1.1"):
     return True
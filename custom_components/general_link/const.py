@@ -10,24 +10,63 @@ CONF_LIGHT_DEVICE_TYPE = "light_device_type"
 
 FLAG_IS_INITIALIZED = "flag_is_initialized"
 
-CACHE_ENTITY_STATE_UPDATE_KEY_DICT = "general_link_entity_state_update_dict"
-
 CONF_ENVKEY = "envkey"
 
 MANUAL_FLAG= "manual_flag"
 
 CONF_PLACE= "place"
 
-EVENT_ENTITY_STATE_UPDATE = "general_link_entity_state_update_{}"
-
-EVENT_ENTITY_REGISTER = "general_link_entity_register_{}"
+EVENT_ENTITY_REGISTER = "general_link_entity_register_{}_{}"
 
+# Config entry id -> MqttClient of that gateway
 MQTT_CLIENT_INSTANCE = "mqtt_client_instance"
 
+# StateWriteBatcher shared by the entities of all gateways
+STATE_WRITE_BATCHER = "general_link_state_write_batcher"
+
+# Seconds entity state writes are collected before they are flushed,
+# 0 flushes them in the next event loop iteration
+STATE_WRITE_DELAY = 0
+
 MQTT_TOPIC_PREFIX = DOMAIN
 
 DEVICE_COUNT_MAX = 100
 
+# q5 device list pages requested at the same time
+DEVICE_LIST_PARALLELISM = 3
+
+# Smallest q5 page size, the largest is DEVICE_COUNT_MAX
+DEVICE_PAGE_SIZE_MIN = 20
+
+# q5 page size adapts so a page answers within this many seconds ...
+DEVICE_PAGE_TARGET_LATENCY = 2
+
+# ... and its payload stays below this many bytes
+DEVICE_PAGE_TARGET_BYTES = 64 * 1024
+
+# Options limiting the state writes of the energy meter sensors: seconds
+# between writes of changed values ...
+CONF_SENSOR_MIN_INTERVAL = "sensor_min_interval"
+DEFAULT_SENSOR_MIN_INTERVAL = 10
+
+# ... seconds after which a value inside the deadband is written anyway ...
+CONF_SENSOR_MAX_INTERVAL = "sensor_max_interval"
+DEFAULT_SENSOR_MAX_INTERVAL = 300
+
+# ... and the change below which a value is inside the deadband, absolute
+# in the sensor unit and relative in percent of the last written value
+CONF_SENSOR_ABS_DEADBAND = "sensor_abs_deadband"
+DEFAULT_SENSOR_ABS_DEADBAND = 0
+
+CONF_SENSOR_REL_DEADBAND = "sensor_rel_deadband"
+DEFAULT_SENSOR_REL_DEADBAND = 1
+
+# Options of the inbound message buffer: its bound and the drop policies of
+# the device event and log report topic classes, see inbound.py
+CONF_INBOUND_MAX_SIZE = "inbound_max_size"
+CONF_INBOUND_EVENT_POLICY = "inbound_event_policy"
+CONF_INBOUND_REPORT_POLICY = "inbound_report_policy"
+
 LOG_REPORT_Q8= "report_q8"
 
 MDNS_SCAN_SERVICE = "_mqtt._tcp.local."
@@ -0,0 +1,53 @@
+"""Match gateway responses to the requests waiting for them."""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Any
+
+# (response topic suffix, seq, ...), e.g. ("p5", 1, 0) answers a q5 request
+# for the page starting at 0 sent with seq 1
+RequestKey = tuple
+
+
+class RequestCorrelator:
+    """Futures waiting for a response, keyed on the response suffix and seq.
+
+    Requests sharing a key are answered in the order they were sent. Every
+    method must be called from the event loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._waiters: dict[RequestKey, deque[asyncio.Future[Any]]] = {}
+
+    def expect(self, key: RequestKey) -> asyncio.Future[Any]:
+        """Return a future resolved with the payload of the next response for key."""
+        future = self._loop.create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        return future
+
+    def resolve(self, key: RequestKey, payload: Any) -> bool:
+        """Hand a response to the oldest waiter of its key, return False if none."""
+        waiters = self._waiters.get(key)
+        while waiters:
+            future = waiters.popleft()
+            if not future.done():
+                future.set_result(payload)
+                break
+        else:
+            return False
+        if not waiters:
+            del self._waiters[key]
+        return True
+
+    def discard(self, key: RequestKey, future: asyncio.Future[Any]) -> None:
+        """Stop waiting, used once a request is answered or timed out."""
+        if (waiters := self._waiters.get(key)) is None:
+            return
+        try:
+            waiters.remove(future)
+        except ValueError:
+            return
+        if not waiters:
+            del self._waiters[key]
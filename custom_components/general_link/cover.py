@@ -1,7 +1,6 @@
 """Business logic for cover entity."""
 from __future__ import annotations
 
-import json
 import logging
 from typing import Any
 
@@ -13,13 +12,15 @@ from homeassistant.components.cover import (
     CoverDeviceClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, MQTT_CLIENT_INSTANCE, EVENT_ENTITY_STATE_UPDATE, CACHE_ENTITY_STATE_UPDATE_KEY_DICT, \
-    EVENT_ENTITY_REGISTER, MANUFACTURER
+from .const import DOMAIN, EVENT_ENTITY_REGISTER, MANUFACTURER
+from .codec import json_dumps
+from .entity import GeneralLinkEntity
+from .mqtt import get_mqtt_client
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -45,13 +46,13 @@ async def async_setup_entry(
             raise
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
 
 
-class CustomCover(CoverEntity):
+class CustomCover(GeneralLinkEntity, CoverEntity):
     """Custom entity class to handle business logic related to curtains"""
 
     def close_cover(self, **kwargs: Any) -> None:
@@ -97,26 +98,6 @@ class CustomCover(CoverEntity):
 
         self.update_state(config)
 
-        """Add a device state change event listener, and execute the specified method when the device state changes. 
-        Note: It is necessary to determine whether an event listener has been added here to avoid repeated additions."""
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-    async def async_added_to_hass(self) -> None:
-        pass
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception:
-            raise
-
     @property
     def device_info(self) -> DeviceInfo:
         """Information about this entity/device."""
@@ -217,9 +198,10 @@ class CustomCover(CoverEntity):
         if action == 3:
             message["data"]["travel"] = round(position / 100, 2)
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        self.async_invalidate_state()
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q21",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
@@ -298,9 +280,10 @@ class CustomCoverA(CustomCover):
         if action == 11:
             message["data"]["angle"] = round(position / 100, 2)
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        self.async_invalidate_state()
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr} /center/q21",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
\ No newline at end of file
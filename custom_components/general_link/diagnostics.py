@@ -0,0 +1,37 @@
+"""Diagnostics support for GeneralLink."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, MQTT_CLIENT_INSTANCE, STATE_WRITE_BATCHER
+
+
+async def async_get_config_entry_diagnostics(
+        hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return gateway startup and MQTT client counters for a config entry."""
+    diagnostics: dict[str, Any] = {}
+    if (hub := hass.data.get(DOMAIN, {}).get(entry.entry_id)) is not None:
+        diagnostics["gateway"] = {
+            "topology_synced": hub.topology_synced,
+            "startup_seconds": hub.startup_duration,
+            "restored_entities": hub.restored_entity_count,
+            "request_timeouts": hub._request_timeouts,
+            "state_updates": hub.state_stats,
+            "state_lookups": hub.state_lookup_stats,
+            "q5_requests_last_minute": hub.q5_requests_last_minute,
+        }
+        diagnostics["state_routes"] = hub.state_router.stats
+    mqtt_client = hass.data.get(MQTT_CLIENT_INSTANCE, {}).get(entry.entry_id)
+    if mqtt_client is not None:
+        diagnostics["mqtt"] = {
+            "connected": mqtt_client.connected,
+            "inbound": mqtt_client.inbound_stats,
+            "acks": mqtt_client.ack_stats,
+        }
+    if (batcher := hass.data.get(STATE_WRITE_BATCHER)) is not None:
+        diagnostics["state_writes"] = batcher.stats
+    return diagnostics
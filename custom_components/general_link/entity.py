@@ -0,0 +1,165 @@
+"""Base entity of the platforms updated from gateway device states."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity import Entity
+
+from .const import DOMAIN, STATE_WRITE_BATCHER, STATE_WRITE_DELAY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def get_state_write_batcher(hass: HomeAssistant) -> "StateWriteBatcher":
+    """Return the state write batcher of the integration, created on first use."""
+    if (batcher := hass.data.get(STATE_WRITE_BATCHER)) is None:
+        batcher = hass.data[STATE_WRITE_BATCHER] = StateWriteBatcher(hass)
+    return batcher
+
+
+class StateRouter:
+    """Hand the states the gateway routed to a key to the entities registered under it.
+
+    Each gateway has its own router. The gateway splits a device state along
+    the fan-out route of the device, see FANOUT_TABLE, and dispatches each
+    part under the route key of the entity reading it. An entity failing on
+    a state is logged and does not keep the others from getting it.
+    """
+
+    def __init__(self) -> None:
+        # Route key -> entities registered under it
+        self._routes: dict[str, dict[GeneralLinkEntity, None]] = {}
+        self.stats = {"dispatched": 0, "woken": 0}
+
+    @callback
+    def async_register(self, entity: "GeneralLinkEntity") -> CALLBACK_TYPE:
+        """Route the states of the entity's route key to it, return the unregister callback"""
+        key = entity.route_key
+        entities = self._routes.setdefault(key, {})
+        entities[entity] = None
+
+        @callback
+        def async_unregister() -> None:
+            entities.pop(entity, None)
+            if not entities and self._routes.get(key) is entities:
+                del self._routes[key]
+
+        return async_unregister
+
+    @callback
+    def async_dispatch(self, key: str, data: dict) -> None:
+        """Hand a state to the entities registered under a route key"""
+        if not (entities := self._routes.get(key)):
+            return
+        self.stats["dispatched"] += 1
+        self.stats["woken"] += len(entities)
+        for entity in tuple(entities):
+            try:
+                entity.async_handle_state(data)
+            except Exception:
+                _LOGGER.exception("Error updating %s with state %s", entity.entity_id, data)
+
+
+class StateWriteBatcher:
+    """Coalesce entity state writes into one flush per event loop iteration.
+
+    Entities that changed are marked dirty and written together by a single
+    callback, STATE_WRITE_DELAY seconds later. An entity marked several times
+    before the flush is written once, with its latest state.
+    """
+
+    def __init__(self, hass: HomeAssistant, delay: float = STATE_WRITE_DELAY) -> None:
+        self.hass = hass
+        self.delay = delay
+        # Insertion ordered, entities are written in the order they changed
+        self._dirty: dict[Entity, None] = {}
+        self._handle: asyncio.Handle | None = None
+        self.stats = {"scheduled": 0, "written": 0, "flushes": 0}
+
+    @callback
+    def async_schedule(self, entity: Entity) -> None:
+        """Write the state of entity with the next flush"""
+        self.stats["scheduled"] += 1
+        self._dirty[entity] = None
+        if self._handle is None:
+            if self.delay:
+                self._handle = self.hass.loop.call_later(self.delay, self._async_flush)
+            else:
+                self._handle = self.hass.loop.call_soon(self._async_flush)
+
+    @callback
+    def async_discard(self, entity: Entity) -> None:
+        """Drop the pending write of an entity that is removed"""
+        self._dirty.pop(entity, None)
+
+    @callback
+    def _async_flush(self) -> None:
+        self._handle = None
+        dirty = self._dirty
+        self._dirty = {}
+        self.stats["flushes"] += 1
+        self.stats["written"] += len(dirty)
+        for entity in dirty:
+            try:
+                entity.async_write_ha_state()
+            except Exception:
+                _LOGGER.exception("Error writing the state of %s", entity.entity_id)
+
+
+class GeneralLinkEntity(Entity):
+    """Entity whose state comes from the event/3 reports of a gateway device.
+
+    The gateway parses a state once and hands the fields each entity reads to
+    the StateRouter, under the entity's route key.
+    """
+
+    _attr_should_poll = False
+
+    # Suffix the fan-out table lists the entity of the device with
+    _route_suffix = ""
+
+    @property
+    def device_key(self) -> str:
+        """Key the gateway keeps the device states of this entity under"""
+        return self.sn
+
+    @property
+    def route_key(self) -> str:
+        """Key the gateway dispatches the states this entity reads under"""
+        return f"{self.device_key}{self._route_suffix}"
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to the states of the device"""
+        await super().async_added_to_hass()
+        hub = self.hass.data[DOMAIN][self.config_entry.entry_id]
+        self.async_on_remove(hub.state_router.async_register(self))
+        batcher = get_state_write_batcher(self.hass)
+        self.async_on_remove(lambda: batcher.async_discard(self))
+
+    @callback
+    def async_handle_state(self, data: dict) -> None:
+        """Apply a device state the entity reads and schedule its write"""
+        if not self.wants_state(data):
+            return
+        self.update_state(data)
+        self.async_schedule_write()
+
+    @callback
+    def async_schedule_write(self) -> None:
+        """Write the state to HA with the next batched flush"""
+        get_state_write_batcher(self.hass).async_schedule(self)
+
+    @callback
+    def async_invalidate_state(self) -> None:
+        """Have the gateway forward the next device state, called before a command"""
+        if (hub := self.hass.data[DOMAIN].get(self.config_entry.entry_id)) is not None:
+            hub.invalidate_state(self.device_key)
+
+    def wants_state(self, data: dict) -> bool:
+        """Return False to skip a routed state, without writing"""
+        return True
+
+    def update_state(self, data: dict) -> None:
+        """Apply the fields of a device state to the entity"""
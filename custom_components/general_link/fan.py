@@ -1,21 +1,22 @@
 """Business logic for fan entity."""
 from __future__ import annotations
 import math
-import json
 import logging
 from typing import Any, Optional 
 from abc import ABC
 from homeassistant.components.fan import FanEntity,FanEntityFeature
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.util.percentage import ranged_value_to_percentage, percentage_to_ranged_value
 from homeassistant.util.scaling import int_states_in_range
 
-from .const import DOMAIN, MQTT_CLIENT_INSTANCE, \
-    EVENT_ENTITY_REGISTER, EVENT_ENTITY_STATE_UPDATE, CACHE_ENTITY_STATE_UPDATE_KEY_DICT, MANUFACTURER
+from .const import DOMAIN, EVENT_ENTITY_REGISTER, MANUFACTURER
+from .codec import json_dumps
+from .entity import GeneralLinkEntity
+from .mqtt import get_mqtt_client
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -40,13 +41,13 @@ async def async_setup_entry(
             raise
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
 
 
-class CustomFan(FanEntity, ABC):
+class CustomFan(GeneralLinkEntity, FanEntity, ABC):
     """Custom entity class to handle business logic related to fan"""
 
     should_poll = False
@@ -59,6 +60,8 @@ class CustomFan(FanEntity, ABC):
 
     _attr_preset_mode = None
 
+    _route_suffix = "F"
+
     
 
     #_attr_speed_count = 3
@@ -98,26 +101,6 @@ class CustomFan(FanEntity, ABC):
 
         self.update_state(config)
 
-        """Add a device state change event listener, and execute the specified method when the device state changes. 
-        Note: It is necessary to determine whether an event listener has been added here to avoid repeated additions."""
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception:
-            raise
-
     @property
     def device_info(self) -> DeviceInfo:
         """Information about this entity/device."""
@@ -239,9 +222,10 @@ class CustomFan(FanEntity, ABC):
             }
         }
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        self.async_invalidate_state()
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q74",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
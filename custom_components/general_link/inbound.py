@@ -0,0 +1,199 @@
+"""Bounded inbound message buffer with per-topic-class drop policies."""
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any
+
+from .codec import json_dumps, json_loads
+
+# Never dropped, the buffer may grow past its bound for these
+POLICY_KEEP = "keep"
+# Only the latest state per device sn is kept while queued
+POLICY_LATEST = "latest"
+# Oldest messages are dropped first when the buffer is full
+POLICY_DROP_OLDEST = "drop_oldest"
+
+# Topic suffix -> policy, topics not listed here are kept
+DEFAULT_INBOUND_POLICIES: dict[str, str] = {
+    "center/p5": POLICY_KEEP,
+    "center/p28": POLICY_KEEP,
+    "center/p33": POLICY_KEEP,
+    "event/3": POLICY_LATEST,
+    "report/q8": POLICY_DROP_OLDEST,
+}
+
+DEFAULT_INBOUND_MAX_SIZE = 5000
+
+# Queued latest states are merged only once the buffer is this full, below it
+# every state is delivered so short on/off pulses are not merged away
+COALESCE_FILL_RATIO = 0.8
+
+# Topics whose policy is remembered, least recently used ones are forgotten
+POLICY_CACHE_SIZE = 256
+
+# Policies in the order their messages are evicted from a full buffer
+_EVICTION_ORDER = (POLICY_DROP_OLDEST, POLICY_LATEST)
+
+_SN_PATTERN = re.compile(rb'"sn"\s*:\s*"([^"]*)"')
+
+
+class _Entry:
+    """A queued message, or a tombstone once dropped."""
+
+    __slots__ = ("msg", "key", "dropped")
+
+    def __init__(self, msg: Any, key: tuple[str, bytes] | None) -> None:
+        self.msg = msg
+        self.key = key
+        self.dropped = False
+
+
+class InboundBuffer:
+    """Queue filled by the paho callback and drained by the event loop.
+
+    The buffer holds at most max_size messages. When it is full the oldest
+    drop_oldest message is evicted first, then the oldest latest message.
+    keep messages are never evicted. A drop_oldest message arriving at a full
+    buffer without a queued drop_oldest message is dropped itself. Once the
+    buffer is COALESCE_FILL_RATIO full, latest messages for a device that is
+    already queued are merged into the queued message, so the device's last
+    value of every field is delivered once.
+    """
+
+    def __init__(
+            self,
+            max_size: int = DEFAULT_INBOUND_MAX_SIZE,
+            policies: dict[str, str] | None = None,
+    ) -> None:
+        self._lock = threading.Lock()
+        self.configure(max_size, policies)
+        self._queue: deque[_Entry] = deque()
+        self._droppable: dict[str, deque[_Entry]] = {
+            policy: deque() for policy in _EVICTION_ORDER
+        }
+        self._latest: dict[tuple[str, bytes], _Entry] = {}
+        self._size = 0
+        self._tombstones = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def configure(
+            self,
+            max_size: int = DEFAULT_INBOUND_MAX_SIZE,
+            policies: dict[str, str] | None = None,
+    ) -> None:
+        """Set the bound and the topic suffix policies, queued messages are kept."""
+        with self._lock:
+            self.max_size = max_size
+            self._policies = DEFAULT_INBOUND_POLICIES if policies is None else policies
+            # Replaced, not cleared, policy_for runs without the lock
+            self._policy_cache: OrderedDict[str, str] = OrderedDict()
+
+    def policy_for(self, topic: str) -> str:
+        """Return the policy of the topic class the topic belongs to."""
+        cache = self._policy_cache
+        if (policy := cache.get(topic)) is not None:
+            cache.move_to_end(topic)
+            return policy
+        policy = POLICY_KEEP
+        for suffix, suffix_policy in self._policies.items():
+            if topic.endswith(suffix):
+                policy = suffix_policy
+                break
+        cache[topic] = policy
+        if len(cache) > POLICY_CACHE_SIZE:
+            cache.popitem(last=False)
+        return policy
+
+    def put(self, msg: Any) -> bool:
+        """Queue a message, return True if it added a new entry.
+
+        False means it was merged into a queued message or dropped.
+        """
+        policy = self.policy_for(msg.topic)
+        key = None
+        if policy == POLICY_LATEST:
+            sns = _SN_PATTERN.findall(msg.payload)
+            if len(sns) == 1:
+                key = (msg.topic, sns[0])
+
+        with self._lock:
+            if (
+                key is not None
+                and self._size >= self.max_size * COALESCE_FILL_RATIO
+                and (entry := self._latest.get(key)) is not None
+            ):
+                if (merged := _merge_state(entry.msg.payload, msg.payload)) is not None:
+                    msg.payload = merged
+                    entry.msg = msg
+                    self.coalesced += 1
+                    return False
+
+            if self._size >= self.max_size and policy != POLICY_KEEP:
+                if not self._evict_oldest(policy):
+                    # Nothing less important to make room for a log message
+                    self.dropped += 1
+                    return False
+
+            entry = _Entry(msg, key)
+            self._queue.append(entry)
+            if policy in self._droppable:
+                self._droppable[policy].append(entry)
+            if key is not None:
+                self._latest[key] = entry
+            self._size += 1
+            return True
+
+    def take_all(self) -> list[Any]:
+        """Remove and return every queued message in arrival order."""
+        with self._lock:
+            queue = self._queue
+            self._queue = deque()
+            for droppable in self._droppable.values():
+                droppable.clear()
+            self._latest.clear()
+            self._size = 0
+            self._tombstones = 0
+        return [entry.msg for entry in queue if not entry.dropped]
+
+    def _evict_oldest(self, incoming_policy: str) -> bool:
+        """Drop the oldest message at most as important as an incoming one.
+
+        Returns False if there was none and the incoming drop_oldest message has
+        to be dropped instead. Called with the lock held.
+        """
+        for policy in _EVICTION_ORDER[:_EVICTION_ORDER.index(incoming_policy) + 1]:
+            droppable = self._droppable[policy]
+            if not droppable:
+                continue
+            entry = droppable.popleft()
+            entry.dropped = True
+            if entry.key is not None:
+                del self._latest[entry.key]
+            self._size -= 1
+            self.dropped += 1
+            self._tombstones += 1
+            if self._tombstones > self.max_size:
+                self._queue = deque(entry for entry in self._queue if not entry.dropped)
+                self._tombstones = 0
+            return True
+        # A latest state is kept even above the bound
+        return incoming_policy != POLICY_DROP_OLDEST
+
+
+def _merge_state(queued: bytes, received: bytes) -> bytes | None:
+    """Merge the single device state of two event payloads, newest fields win."""
+    try:
+        queued_payload = json_loads(queued.rstrip(b"\x00"))
+        received_payload = json_loads(received.rstrip(b"\x00"))
+        queued_state = queued_payload["data"][0]
+        received_state = received_payload["data"][0]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    received_payload["data"] = [{**queued_state, **received_state}]
+    return json_dumps(received_payload)
@@ -1,19 +1,21 @@
 """Business logic for light entity."""
 from __future__ import annotations
 
-import json
 import logging
 from typing import Any
 
 from homeassistant.components.light import LightEntity, ColorMode
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, MQTT_CLIENT_INSTANCE, \
-    EVENT_ENTITY_REGISTER, EVENT_ENTITY_STATE_UPDATE, CACHE_ENTITY_STATE_UPDATE_KEY_DICT, MANUFACTURER
+from .const import DOMAIN, EVENT_ENTITY_REGISTER, MANUFACTURER
+from .codec import json_dumps
+from .entity import GeneralLinkEntity
+from .mqtt import get_mqtt_client
 from .util import color_temp_to_rgb
 
 _LOGGER = logging.getLogger(__name__)
@@ -28,6 +30,9 @@ LIGHT_MHT_MIN_KELVIN = 2700
 
 LIGHT_MHT_MAX_KELVIN = 6300
 
+# Seconds during which further commands to a light are merged into one q20
+LIGHT_COMMAND_WINDOW = 0.3
+
 
 async def async_setup_entry(
         hass: HomeAssistant,
@@ -44,13 +49,13 @@ async def async_setup_entry(
             raise
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
 
 
-class CustomLight(LightEntity):
+class CustomLight(GeneralLinkEntity, LightEntity):
     """Custom entity class to handle business logic related to lights"""
 
     def turn_on(self, **kwargs: Any) -> None:
@@ -118,27 +123,21 @@ class CustomLight(LightEntity):
 
         self.mqttAddr = config_entry.data.get("mqttAddr",0)
 
+        # Command fields waiting for the end of the window, see async_send_command
+        self._pending_command: dict = {}
+
+        self._command_handle = None
+
+        self._last_command_time = float("-inf")
+
         #_LOGGER.warning(f"light{config_entry.data}")
 
         self.update_state(config)
 
-        """Add a device state change event listener, and execute the specified method when the device state changes. 
-        Note: It is necessary to determine whether an event listener has been added here to avoid repeated additions."""
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-    
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception:
-            raise
+    @property
+    def device_key(self) -> str:
+        """Light groups are dispatched under their room-subgroup id"""
+        return self.unique_id
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -213,19 +212,16 @@ class CustomLight(LightEntity):
             self._attr_brightness = int(data["level"] * 255)
 
     async def async_turn_on(self, **kwargs):
-        """Turn on the light, switch color temperature, switch brightness, switch color operations"""
-        on = 1
-        level = None
-        kelvin = None
-        rgb = None
+        """Turn on the light, switch color temperature, brightness and color with one command"""
+        command = {}
+
+        if not self.on_off or not any(
+                key in kwargs for key in ("color_temp", "brightness", "rgb_color")
+        ):
+            command["on"] = 1
 
         if "color_temp" in kwargs:
             """HA color temperature control page is reversed"""
-
-            if not self.on_off:
-                self.on_off = True
-                await self.exec_command(on=1)
-
             kelvin = int(kwargs["color_temp"])
             kelvin_bl = (kelvin - LIGHT_MIN_KELVIN) / (LIGHT_MAX_KELVIN - LIGHT_MIN_KELVIN)
             kelvin = LIGHT_MHT_MAX_KELVIN - round(kelvin_bl * (LIGHT_MHT_MAX_KELVIN - LIGHT_MHT_MIN_KELVIN))
@@ -233,37 +229,23 @@ class CustomLight(LightEntity):
                 kelvin = LIGHT_MHT_MAX_KELVIN
             if kelvin < LIGHT_MHT_MIN_KELVIN:
                 kelvin = LIGHT_MHT_MIN_KELVIN
-            on = None
+            command["kelvin"] = kelvin
             self._attr_color_temp = kwargs["color_temp"]
             self._attr_rgb_color = color_temp_to_rgb(kelvin)
             self._attr_color_mode = ColorMode.COLOR_TEMP
 
         if "brightness" in kwargs:
-
-            if not self.on_off:
-                self.on_off = True
-                await self.exec_command(on=1)
-
             brightness_normalized = kwargs["brightness"] / 255
-            level = round(brightness_normalized, 6)
-
-            on = None
+            command["level"] = round(brightness_normalized, 6)
             self._attr_brightness = kwargs["brightness"]
 
         if "rgb_color" in kwargs:
-
-            if not self.on_off:
-                self.on_off = True
-                await self.exec_command(on=1)
-
             rgb = kwargs["rgb_color"]
-            rgb = (rgb[0] << 16) + (rgb[1] << 8) + rgb[2]
-
-            on = None
+            command["rgb"] = (rgb[0] << 16) + (rgb[1] << 8) + rgb[2]
             self._attr_rgb_color = kwargs["rgb_color"]
             self._attr_color_mode = ColorMode.RGB
 
-        await self.exec_command(on=on, level=level, kelvin=kelvin, rgb=rgb)
+        self.async_send_command(command)
 
         self.on_off = True
 
@@ -272,13 +254,70 @@ class CustomLight(LightEntity):
     async def async_turn_off(self, **kwargs):
         """Turn off the lights"""
 
-        await self.exec_command(on=0)
+        self.async_send_command({"on": 0})
 
         self.on_off = False
 
         self.async_write_ha_state()
 
-    async def exec_command(self, on=None, level=None, kelvin=None, rgb=None):
+    async def async_will_remove_from_hass(self) -> None:
+        """Send the command still waiting for its window"""
+        if self._command_handle is not None:
+            self._async_flush_pending_command()
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def async_send_command(self, command: dict) -> None:
+        """Send a q20 command, merged with the commands of the next LIGHT_COMMAND_WINDOW seconds.
+
+        A command is published at once if the last one is older than the
+        window, otherwise when the window ends, carrying the latest target
+        of every field. Dragging a slider thus publishes one command per window.
+        Errors of a command published at once are raised to the service call,
+        those of a command sent when the window ends are logged.
+        """
+        pending = self._pending_command
+        if command.get("on") == 0:
+            pending.clear()
+        if "kelvin" in command:
+            pending.pop("rgb", None)
+        if "rgb" in command:
+            pending.pop("kelvin", None)
+        pending.update(command)
+
+        if self._command_handle is not None:
+            return
+        loop = self.hass.loop
+        send_at = self._last_command_time + LIGHT_COMMAND_WINDOW
+        if loop.time() >= send_at:
+            self._async_flush_command()
+        else:
+            self._command_handle = loop.call_at(send_at, self._async_flush_pending_command)
+
+    @callback
+    def _async_flush_pending_command(self) -> None:
+        """Send the merged command once its window ended, nobody waits to see its error"""
+        try:
+            self._async_flush_command()
+        except HomeAssistantError as err:
+            _LOGGER.error("Unable to send the command of %s: %s", self.entity_id, err)
+
+    @callback
+    def _async_flush_command(self) -> None:
+        if self._command_handle is not None:
+            self._command_handle.cancel()
+            self._command_handle = None
+        command = self._pending_command
+        self._pending_command = {}
+        self._last_command_time = self.hass.loop.time()
+        self.async_invalidate_state()
+        get_mqtt_client(self.hass, self.config_entry).publish_nowait(
+            f"P/{self.mqttAddr}/center/q20",
+            json_dumps(self._command_message(**command)),
+        )
+
+    def _command_message(self, on=None, level=None, kelvin=None, rgb=None) -> dict:
+        """Build the q20 message of a light command"""
         message = {
             "seq": 1,
             "rspTo": "A/hass",
@@ -309,9 +348,4 @@ class CustomLight(LightEntity):
             message["data"]["over"] = 1
             message["data"]["rgb"] = rgb
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
-            f"P/{self.mqttAddr}/center/q20",
-            json.dumps(message),
-            0,
-            False
-        )
+        return message
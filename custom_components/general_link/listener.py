@@ -1,5 +1,4 @@
 import socket
-import json
 import logging
 import asyncio
 from typing import Any
@@ -9,6 +8,7 @@ from homeassistant.const import CONF_ADDRESS
 from homeassistant.helpers.storage import Store
 from ipaddress import ip_network
 from netaddr import IPNetwork
+from .codec import json_dumps, json_loads
 from .const import CONF_ENVKEY, MANUAL_FLAG, CONF_PLACE
 from cryptography.fernet import Fernet
 
@@ -51,8 +51,7 @@ async def _async_send_receive_udp_broadcast(hass: HomeAssistant, data: dict, por
 
     # 绑定到所有网络接口和指定的端口
     sock.bind(("", port))
-    data_str = json.dumps(data)
-    data_bytes = data_str.encode('utf-8')
+    data_bytes = json_dumps(data)
     if dest_address is not None:
         send_address = dest_address
     else:
@@ -72,8 +71,7 @@ async def _async_send_receive_udp_broadcast(hass: HomeAssistant, data: dict, por
             
             
             if data is not None:
-                data_str = data.decode('utf-8')
-                data_dict = json.loads(data_str)
+                data_dict = json_loads(data)
                 _LOGGER.debug("data_dict1 %s", data_dict)
                 return data_dict
     except socket.timeout:
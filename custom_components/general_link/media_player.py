@@ -1,7 +1,6 @@
 """Business logic for light entity."""
 from __future__ import annotations
 
-import json
 import logging
 import homeassistant.util.dt as dt_util
 from typing import Any
@@ -10,16 +9,18 @@ from homeassistant.components.media_player import MediaPlayerEntity, MediaType,M
     MediaPlayerEntityFeature, RepeatMode,BrowseMedia
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity import DeviceInfo
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from urllib.parse import urlparse, parse_qs, parse_qsl, quote
 
 from homeassistant.components.media_player.const import MediaType
 
-from .const import MQTT_CLIENT_INSTANCE, MANUFACTURER,\
-    EVENT_ENTITY_REGISTER, EVENT_ENTITY_STATE_UPDATE,\
-    CACHE_ENTITY_STATE_UPDATE_KEY_DICT,MQTT_TOPIC_PREFIX,DOMAIN
+from .const import MANUFACTURER,\
+    EVENT_ENTITY_REGISTER,MQTT_TOPIC_PREFIX,DOMAIN
+from .codec import json_dumps
+from .entity import GeneralLinkEntity
+from .mqtt import get_mqtt_client
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -52,13 +53,13 @@ async def async_setup_entry(
             raise
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
 
 
-class CustomMediaPlayer(MediaPlayerEntity):
+class CustomMediaPlayer(GeneralLinkEntity, MediaPlayerEntity):
     """Representation of a MPD server."""
 
     _attr_media_content_type = MediaType.MUSIC
@@ -71,6 +72,7 @@ class CustomMediaPlayer(MediaPlayerEntity):
         self.sn = config["sn"]
         self._model = config["model"]
         self.hass = hass
+        self.config_entry = config_entry
         self._status = MediaPlayerState.PAUSED
         self._muted = False
         self._volume = False
@@ -86,27 +88,12 @@ class CustomMediaPlayer(MediaPlayerEntity):
         self._media_position_updated_at = None
         self._attr_available = True
         self._currentsong = self._media_title
-        self._unsub = None
         self.update_state(config)
         
     async def async_added_to_hass(self) -> None:
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in self.hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            self._unsub = async_dispatcher_connect(
-                self.hass, key, self.async_discover
-            )
-            self.hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = self._unsub 
-            self.async_on_remove(self._unsub)
+        await super().async_added_to_hass()
         await self.exec_command_playlist({})
 
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception as s:
-            _LOGGER.error("mp_Discovered %s", s)
     @property
     def device_info(self) -> DeviceInfo:
         """Information about this entity/device."""
@@ -475,9 +462,9 @@ class CustomMediaPlayer(MediaPlayerEntity):
             "data": data
         }
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q56",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
@@ -494,9 +481,9 @@ class CustomMediaPlayer(MediaPlayerEntity):
             "data": data
         }
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q55",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
@@ -1,10 +1,9 @@
 import asyncio
 import logging
-import random
 import ssl
+import threading
 import time
-from functools import lru_cache
-from typing import Any, Iterable, Callable
+from typing import Any, Iterable, Callable, Mapping
 from .util import version_compare
 
 #用来对比当前版本是否比2024.5.0低的
@@ -31,10 +30,24 @@ from homeassistant.util import dt as dt_util
 from paho.mqtt import client
 from paho.mqtt.client import MQTTMessage
 
-from .const import CONF_BROKER
+from .ack import AckTracker
+from .const import CONF_BROKER, MQTT_CLIENT_INSTANCE
+from .inbound import DEFAULT_INBOUND_MAX_SIZE, InboundBuffer
+from .topic_trie import TopicTrie
 
 _LOGGER = logging.getLogger(__name__)
 
+# Upper bound of packets handled per socket read callback
+MAX_PACKETS_TO_READ = 500
+
+# Interval in seconds between paho loop_misc calls (keepalive and retries)
+MISC_LOOP_INTERVAL = 1
+
+# Seconds before the first reconnect attempt, doubled after every failed
+# attempt up to RECONNECT_MAX_INTERVAL
+RECONNECT_MIN_INTERVAL = 1
+RECONNECT_MAX_INTERVAL = 60
+
 def _raise_on_error(result_code: int) -> None:
     """Raise error if error result."""
     # pylint: disable-next=import-outside-toplevel
@@ -57,6 +70,17 @@ def _raise_on_errors(result_codes: Iterable[int | None]) -> None:
         raise HomeAssistantError(f"Error talking to MQTT: {', '.join(messages)}")
 
 
+def client_id_for_entry(config_entry: ConfigEntry) -> str:
+    """Return the MQTT client id of a config entry, stable across restarts."""
+    # Keep within the 23 characters every MQTT 3.1.1 broker has to accept
+    return f"hass-gl-{config_entry.entry_id[-15:]}"
+
+
+def get_mqtt_client(hass: HomeAssistant, config_entry: ConfigEntry) -> "MqttClient":
+    """Return the MQTT client of the gateway a config entry belongs to."""
+    return hass.data[MQTT_CLIENT_INSTANCE][config_entry.entry_id]
+
+
 class MqttClient:
 
     def __init__(
@@ -64,9 +88,15 @@ class MqttClient:
             hass: HomeAssistant,
             config_entry: ConfigEntry,
             conf: ConfigType,
+            loop_transport: bool = True,
+            inbound_max_size: int = DEFAULT_INBOUND_MAX_SIZE,
+            inbound_policies: dict[str, str] | None = None,
     ) -> None:
-        self._client = client.Client(client_id=f'python-mqtt-{random.randint(0, 1000)}')
-        #self._client = client.Client(f'{random.randint(10000, 20000)}')
+        # A stable client id and a persistent session let the broker keep our
+        # subscriptions across reconnects
+        self._client = client.Client(
+            client_id=client_id_for_entry(config_entry), clean_session=False
+        )
         self.hass = hass
         self.config_entry = config_entry
         self.conf = conf
@@ -75,13 +105,36 @@ class MqttClient:
         self._username = conf[CONF_USERNAME]
         self._password = conf[CONF_PASSWORD]
         self.connected = False
-        self._pending_operations: dict[int, asyncio.Event] = {}
+        # Set from the CONNACK, True when the broker resumed our previous session
+        self.session_present = False
+        # Outstanding publish / subscribe / unsubscribe ACKs
+        self._acks = AckTracker(hass.loop)
+        # QoS 0 publishes nobody waits on, their ACK callbacks are dropped
+        self._fire_and_forget_mids: set[int] = set()
+        # SUBACK granted QoS per mid, until the subscriber picks it up
+        self._granted_qos: dict[int, tuple[int, ...]] = {}
         self.subscriptions: list[Subscription] = []
-        self._pending_operations_condition = asyncio.Condition()
+        self._subscription_trie = TopicTrie()
         self._client.username_pw_set(self._username, password=self._password)
         if CONF_CERTIFICATE in conf:
             self._client.tls_set(ca_certs=conf[CONF_CERTIFICATE],cert_reqs=ssl.CERT_NONE)
         self._paho_lock = asyncio.Lock()
+        # Drive paho's socket from the event loop instead of a network thread
+        self._loop_transport = loop_transport
+        self._misc_timer: asyncio.TimerHandle | None = None
+        self._socket_fileno: int | None = None
+        # Replaces paho's automatic reconnect of loop_start, see _async_reconnect_loop
+        self._reconnect_task: asyncio.Task | None = None
+        # Inbound messages waiting for the next loop tick, filled by paho
+        self._inbound_queue = InboundBuffer(inbound_max_size, inbound_policies)
+        self._inbound_drain_scheduled = False
+        self._inbound_stats = {
+            "batches": 0,
+            "messages": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "max_queue_depth": 0,
+        }
 
     def init_client(self) -> None:
         """Initialize paho client."""
@@ -91,6 +144,84 @@ class MqttClient:
         self._client.on_publish = self._mqtt_on_callback
         self._client.on_subscribe = self._mqtt_on_callback
         self._client.on_unsubscribe = self._mqtt_on_callback
+        if self._loop_transport:
+            self._client.on_socket_open = self._on_socket_open
+            self._client.on_socket_close = self._on_socket_close
+            self._client.on_socket_register_write = self._on_socket_register_write
+            self._client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _call_in_loop(self, func: Callable[..., None], *args: Any) -> None:
+        """Run a callback on the event loop, directly when already on it."""
+        if threading.get_ident() == self.hass.loop_thread_id:
+            func(*args)
+        else:
+            self.hass.loop.call_soon_threadsafe(func, *args)
+
+    def _on_socket_open(self, _mqttc: client, _userdata: None, sock) -> None:
+        """Socket opened callback, may run in the executor during connect."""
+        self._call_in_loop(self._async_on_socket_open, sock.fileno())
+
+    def _on_socket_close(self, _mqttc: client, _userdata: None, sock) -> None:
+        """Socket about to be closed callback."""
+        self._call_in_loop(self._async_on_socket_close, sock.fileno())
+
+    def _on_socket_register_write(self, _mqttc: client, _userdata: None, sock) -> None:
+        """Paho has data waiting to be written."""
+        self._call_in_loop(self._async_on_socket_register_write, sock.fileno())
+
+    def _on_socket_unregister_write(self, _mqttc: client, _userdata: None, sock) -> None:
+        """Paho's outgoing buffer is empty."""
+        self._call_in_loop(self._async_on_socket_unregister_write, sock.fileno())
+
+    @callback
+    def _async_on_socket_open(self, fileno: int) -> None:
+        if fileno < 0:
+            return
+        self._socket_fileno = fileno
+        self.hass.loop.add_reader(fileno, self._async_reader_callback)
+        if self._misc_timer is None:
+            self._async_misc()
+        # Consume what is already buffered, add_reader only fires on the next tick
+        self._async_reader_callback()
+
+    @callback
+    def _async_on_socket_close(self, fileno: int) -> None:
+        if fileno > -1:
+            self.hass.loop.remove_reader(fileno)
+            self.hass.loop.remove_writer(fileno)
+        self._socket_fileno = None
+        if self._misc_timer is not None:
+            self._misc_timer.cancel()
+            self._misc_timer = None
+
+    @callback
+    def _async_on_socket_register_write(self, fileno: int) -> None:
+        if fileno > -1:
+            self.hass.loop.add_writer(fileno, self._async_writer_callback)
+
+    @callback
+    def _async_on_socket_unregister_write(self, fileno: int) -> None:
+        if fileno > -1:
+            self.hass.loop.remove_writer(fileno)
+
+    @callback
+    def _async_reader_callback(self) -> None:
+        """Read and handle incoming packets."""
+        self._client.loop_read(MAX_PACKETS_TO_READ)
+
+    @callback
+    def _async_writer_callback(self) -> None:
+        """Flush paho's outgoing buffer."""
+        self._client.loop_write()
+
+    @callback
+    def _async_misc(self) -> None:
+        """Run paho housekeeping (keepalive pings, retries) once per interval."""
+        self._misc_timer = None
+        if self._client.loop_misc() == client.MQTT_ERR_SUCCESS:
+            self._misc_timer = self.hass.loop.call_later(
+                MISC_LOOP_INTERVAL, self._async_misc
+            )
 
     async def async_connect(self):
         """Connect to the host. Does not process messages yet."""
@@ -117,7 +248,37 @@ class MqttClient:
                 "Failed to connect to MQTT server: %s", client.error_string(result)
             )
 
-        self._client.loop_start()
+        if not self._loop_transport:
+            self._client.loop_start()
+        elif self._reconnect_task is None:
+            self._reconnect_task = self.config_entry.async_create_background_task(
+                self.hass, self._async_reconnect_loop(), "general_link_mqtt_reconnect"
+            )
+
+    async def _async_reconnect_loop(self) -> None:
+        """Reconnect after a lost connection or a failed first connect.
+
+        Without loop_start paho does not reconnect by itself. Attempts back off
+        from RECONNECT_MIN_INTERVAL to RECONNECT_MAX_INTERVAL seconds and start
+        over once connected.
+        """
+        delay = RECONNECT_MIN_INTERVAL
+        while True:
+            await asyncio.sleep(delay)
+            # An open socket without CONNACK yet is still connecting
+            if self.connected or self._socket_fileno is not None:
+                delay = RECONNECT_MIN_INTERVAL
+                continue
+            try:
+                result = await self.hass.async_add_executor_job(self._client.reconnect)
+            except OSError as err:
+                _LOGGER.debug("Failed to reconnect to MQTT server: %s", err)
+            else:
+                if result != 0:
+                    _LOGGER.debug(
+                        "Failed to reconnect to MQTT server: %s", client.error_string(result)
+                    )
+            delay = min(delay * 2, RECONNECT_MAX_INTERVAL)
 
     async def async_disconnect(self) -> None:
         """Stop the MQTT client."""
@@ -126,22 +287,25 @@ class MqttClient:
             """Stop the MQTT client."""
             # Do not disconnect, we want the broker to always publish will
             self._client.disconnect()
-            self._client.loop_stop()
+            if not self._loop_transport:
+                self._client.loop_stop()
 
-        def no_more_acks() -> bool:
-            """Return False if there are unprocessed ACKs."""
-            return not bool(self._pending_operations)
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
 
         # wait for ACKs to be processed
-        async with self._pending_operations_condition:
-            await self._pending_operations_condition.wait_for(no_more_acks)
+        await self._acks.async_drain(TIMEOUT_ACK)
 
         # stop the MQTT loop
+        if self._loop_transport:
+            stop()
+            return
         async with self._paho_lock:
             await self.hass.async_add_executor_job(stop)
 
     def _mqtt_on_connect(
-            self, _mqttc: client, _userdata: None, _flags: dict[str, Any], result_code: int
+            self, _mqttc: client, _userdata: None, flags: dict[str, Any], result_code: int
     ) -> None:
         #global VERSION_FLAG
         """On connect callback.
@@ -158,27 +322,34 @@ class MqttClient:
             return
 
         self.connected = True
-        
+        self.session_present = bool(flags.get("session present"))
+
         dispatcher_send(self.hass, MQTT_CONNECTION_STATE, True)
         _LOGGER.warning(
-            "Connected to MQTT server %s:%s (%s)",
+            "Connected to MQTT server %s:%s (%s), session present: %s",
             self.conf[CONF_BROKER],
             self.conf[CONF_PORT],
             result_code,
+            self.session_present,
         )
 
+        if self.session_present:
+            # The broker still holds our subscriptions
+            return
+
         # Group subscriptions to only re-subscribe once for each topic.
         keyfunc = attrgetter("topic")
-        self.hass.add_job(
-            self._async_perform_subscriptions,
-            [
-                # Re-subscribe with the highest requested qos
-                (topic, max(subscription.qos for subscription in subs))
-                for topic, subs in groupby(
-                sorted(self.subscriptions, key=keyfunc), keyfunc
-            )
-            ],
+        subscriptions = [
+            # Re-subscribe with the highest requested qos
+            (topic, max(subscription.qos for subscription in subs))
+            for topic, subs in groupby(
+            sorted(self.subscriptions, key=keyfunc), keyfunc
         )
+        ]
+        if self._loop_transport:
+            self.hass.async_create_task(self._async_perform_subscriptions(subscriptions))
+        else:
+            self.hass.add_job(self._async_perform_subscriptions, subscriptions)
 
     async def async_subscribe(
             self,
@@ -191,21 +362,71 @@ class MqttClient:
 
         This method is a coroutine.
         """
+        async_remove = self._async_add_subscription(topic, msg_callback, qos, encoding)
+
+        # Only subscribe if currently connected.
+        if self.connected:
+            self._last_subscribe = time.time()
+            await self._async_perform_subscriptions(((topic, qos),))
+
+        return async_remove
+
+    async def async_subscribe_bulk(
+            self,
+            topics: Iterable[str],
+            msg_callback: MessageCallbackType | Mapping[str, MessageCallbackType],
+            qos: int,
+            encoding: str | None = None,
+    ) -> tuple[list[Callable[[], None]], dict[str, int]]:
+        """Subscribe to several topics with one SUBSCRIBE packet.
+
+        msg_callback is either shared by every topic or a mapping of topic to
+        the callback of that topic.
+
+        Returns the remove callbacks and the QoS the broker granted per topic,
+        0x80 marks a topic the broker refused or did not acknowledge.
+
+        This method is a coroutine.
+        """
+        topics = list(dict.fromkeys(topics))
+        removers = [
+            self._async_add_subscription(
+                topic,
+                msg_callback[topic] if isinstance(msg_callback, Mapping) else msg_callback,
+                qos,
+                encoding,
+            )
+            for topic in topics
+        ]
+
+        granted: dict[str, int] = {}
+        # Only subscribe if currently connected.
+        if self.connected and topics:
+            self._last_subscribe = time.time()
+            granted = await self._async_perform_subscriptions(
+                [(topic, qos) for topic in topics]
+            )
+
+        return removers, granted
+
+    @callback
+    def _async_add_subscription(
+            self,
+            topic: str,
+            msg_callback: MessageCallbackType,
+            qos: int,
+            encoding: str | None,
+    ) -> Callable[[], None]:
+        """Register a subscription locally and return its remove callback."""
         if not isinstance(topic, str):
             raise HomeAssistantError("Topic needs to be a string!")
-        
-        
+
         is_simple_match = not ("+" in topic or "#" in topic)
         subscription = Subscription(
                 topic,is_simple_match, _matcher_for_topic(topic), HassJob(msg_callback), qos, encoding
             )
         self.subscriptions.append(subscription)
-        self._matching_subscriptions.cache_clear()
-
-        # Only subscribe if currently connected.
-        if self.connected:
-            self._last_subscribe = time.time()
-            await self._async_perform_subscriptions(((topic, qos),))
+        self._subscription_trie.add(topic, subscription)
 
         @callback
         def async_remove() -> None:
@@ -213,7 +434,7 @@ class MqttClient:
             if subscription not in self.subscriptions:
                 raise HomeAssistantError("Can't remove subscription twice")
             self.subscriptions.remove(subscription)
-            self._matching_subscriptions.cache_clear()
+            self._subscription_trie.remove(topic, subscription)
 
             # Only unsubscribe if currently connected
             if self.connected:
@@ -223,35 +444,40 @@ class MqttClient:
 
     async def _async_perform_subscriptions(
             self, subscriptions: Iterable[tuple[str, int]]
-    ) -> None:
-        """Perform MQTT client subscriptions."""
-
-        def _process_client_subscriptions() -> list[tuple[int, int]]:
-            """Initiate all subscriptions on the MQTT client and return the results."""
-            subscribe_result_list = []
-            for topic, qos in subscriptions:
-                result, mid = self._client.subscribe(topic, qos)
-                subscribe_result_list.append((result, mid))
-                _LOGGER.debug("Subscribing to %s, mid: %s", topic, mid)
-            return subscribe_result_list
-
-        async with self._paho_lock:
-            results = await self.hass.async_add_executor_job(
-                _process_client_subscriptions
-            )
+    ) -> dict[str, int]:
+        """Send all subscriptions in one SUBSCRIBE packet and wait for the SUBACK.
 
-        tasks = []
-        errors = []
-        for result, mid in results:
+        Returns the granted QoS per topic.
+        """
+        subscriptions = list(subscriptions)
+        if not subscriptions:
+            return {}
+
+        def _process_client_subscriptions() -> tuple[int, int]:
+            """Initiate the subscriptions on the MQTT client and return the result."""
+            result, mid = self._client.subscribe(subscriptions)
+            _LOGGER.debug("Subscribing to %s, mid: %s", subscriptions, mid)
             if result == 0:
-                tasks.append(self._wait_for_mid(mid))
-            else:
-                errors.append(result)
+                self._call_in_loop(self._acks.register, mid)
+            return result, mid
+
+        if self._loop_transport:
+            result, mid = _process_client_subscriptions()
+        else:
+            async with self._paho_lock:
+                result, mid = await self.hass.async_add_executor_job(
+                    _process_client_subscriptions
+                )
+
+        if result != 0:
+            _raise_on_error(result)
 
-        if tasks:
-            await asyncio.gather(*tasks)
-        if errors:
-            _raise_on_errors(errors)
+        await self._wait_for_mid(mid)
+        granted_qos = self._granted_qos.pop(mid, ())
+        return {
+            topic: granted_qos[index] if index < len(granted_qos) else 0x80
+            for index, (topic, _qos) in enumerate(subscriptions)
+        }
 
     def _mqtt_on_disconnect(
             self, _mqttc: client, _userdata: None, result_code: int
@@ -259,6 +485,8 @@ class MqttClient:
         """Disconnected callback."""
         _LOGGER.warning("Disconnected ===============================================================")
         self.connected = False
+        # Unsent QoS 0 messages are discarded by paho, their mids will never be ACKed
+        self.hass.loop.call_soon_threadsafe(self._fire_and_forget_mids.clear)
         dispatcher_send(self.hass, MQTT_CONNECTION_STATE, False)
         
         _LOGGER.warning(
@@ -271,8 +499,62 @@ class MqttClient:
     def _mqtt_on_message(
             self, _mqttc: client, _userdata: None, msg: MQTTMessage
     ) -> None:
-        """Message received callback."""
-        self.hass.add_job(self._mqtt_handle_message, msg)
+        """Message received callback, queue the message for the next batch."""
+        if not self._inbound_queue.put(msg):
+            # Merged into a message that is already waiting, or dropped
+            return
+        depth = len(self._inbound_queue)
+        if depth > self._inbound_stats["max_queue_depth"]:
+            self._inbound_stats["max_queue_depth"] = depth
+        if not self._inbound_drain_scheduled:
+            self._inbound_drain_scheduled = True
+            self.hass.loop.call_soon_threadsafe(self._async_drain_inbound)
+
+    @callback
+    def _async_drain_inbound(self) -> None:
+        """Match and dispatch every queued inbound message in one loop callback."""
+        # Reset before draining so a message queued meanwhile schedules a new drain
+        self._inbound_drain_scheduled = False
+        batch: list[MQTTMessage] = self._inbound_queue.take_all()
+        if not batch:
+            return
+
+        stats = self._inbound_stats
+        stats["batches"] += 1
+        stats["messages"] += len(batch)
+        stats["last_batch_size"] = len(batch)
+        if len(batch) > stats["max_batch_size"]:
+            stats["max_batch_size"] = len(batch)
+
+        timestamp = dt_util.utcnow()
+        matches: dict[str, list[Subscription]] = {}
+        for msg in batch:
+            if (subscriptions := matches.get(msg.topic)) is None:
+                subscriptions = matches[msg.topic] = self._matching_subscriptions(msg.topic)
+            self._mqtt_handle_message(msg, subscriptions, timestamp)
+
+    @property
+    def inbound_stats(self) -> dict[str, int]:
+        """Batch size, queue depth, dropped and coalesced counters of inbound delivery."""
+        return {
+            **self._inbound_stats,
+            "queue_depth": len(self._inbound_queue),
+            "dropped": self._inbound_queue.dropped,
+            "coalesced": self._inbound_queue.coalesced,
+        }
+
+    def configure_inbound(
+            self,
+            inbound_max_size: int = DEFAULT_INBOUND_MAX_SIZE,
+            inbound_policies: dict[str, str] | None = None,
+    ) -> None:
+        """Change the bound and drop policies of the inbound buffer."""
+        self._inbound_queue.configure(inbound_max_size, inbound_policies)
+
+    @property
+    def ack_stats(self) -> dict[str, Any]:
+        """Outstanding ACKs, ACK timeouts and the ACK wait histogram."""
+        return self._acks.stats
 
     async def _async_unsubscribe(self, topic: str) -> None:
         """Unsubscribe from a topic.
@@ -287,54 +569,62 @@ class MqttClient:
             _LOGGER.debug("Unsubscribing from %s, mid: %s", topic, mid)
             _raise_on_error(result)
             assert mid
+            self._call_in_loop(self._acks.register, mid)
             return mid
 
         if any(other.topic == topic for other in self.subscriptions):
             # Other subscriptions on topic remaining - don't unsubscribe.
             return
 
-        async with self._paho_lock:
-            mid = await self.hass.async_add_executor_job(_client_unsubscribe, topic)
-            await self._register_mid(mid)
+        if self._loop_transport:
+            mid = _client_unsubscribe(topic)
+        else:
+            async with self._paho_lock:
+                mid = await self.hass.async_add_executor_job(_client_unsubscribe, topic)
 
         self.hass.async_create_task(self._wait_for_mid(mid))
 
-    @lru_cache(2048)
     def _matching_subscriptions(self, topic: str) -> list[Subscription]:
-        subscriptions: list[Subscription] = []
-        
-        for subscription in self.subscriptions:
-            if subscription.complex_matcher(topic):
-                subscriptions.append(subscription)
-        return subscriptions
+        return self._subscription_trie.match(topic)
 
     @callback
-    def _mqtt_handle_message(self, msg: MQTTMessage) -> None:
-        _LOGGER.debug(
-            "Received%s message on %s: %s",
-            " retained" if msg.retain else "",
-            msg.topic,
-            msg.payload[0:8192],
-        )
-        timestamp = dt_util.utcnow()
-
-        subscriptions = self._matching_subscriptions(msg.topic)
-
+    def _mqtt_handle_message(
+            self,
+            msg: MQTTMessage,
+            subscriptions: list[Subscription] | None = None,
+            timestamp=None,
+    ) -> None:
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "Received%s message on %s: %s",
+                " retained" if msg.retain else "",
+                msg.topic,
+                msg.payload[0:8192],
+            )
+        if timestamp is None:
+            timestamp = dt_util.utcnow()
+        if subscriptions is None:
+            subscriptions = self._matching_subscriptions(msg.topic)
+
+        # Decoded payload per encoding, None when it can't be decoded. Overlapping
+        # subscriptions share one strip and decode, msg.payload is left untouched.
+        decoded: dict[str, str | None] = {}
         for subscription in subscriptions:
 
             payload: SubscribePayloadType = msg.payload
-            if subscription.encoding is not None:
-                try:
-                    #gu
-                    msg.payload = msg.payload.rstrip(b'\x00')
-
-                    payload = msg.payload.decode(subscription.encoding)
-                except (AttributeError, UnicodeDecodeError):
+            if (encoding := subscription.encoding) is not None:
+                if encoding not in decoded:
+                    try:
+                        #gu
+                        decoded[encoding] = msg.payload.rstrip(b'\x00').decode(encoding)
+                    except (AttributeError, UnicodeDecodeError, LookupError):
+                        decoded[encoding] = None
+                if (payload := decoded[encoding]) is None:
                     _LOGGER.warning(
                         "Can't decode payload %s on %s with encoding %s (for %s)",
                         msg.payload[0:8192],
                         msg.topic,
-                        subscription.encoding,
+                        encoding,
                         subscription.job,
                     )
                     continue
@@ -355,47 +645,58 @@ class MqttClient:
             _mqttc: client,
             _userdata: None,
             mid: int,
-            _granted_qos: tuple[Any, ...] | None = None,
+            granted_qos: tuple[Any, ...] | None = None,
     ) -> None:
         """Publish / Subscribe / Unsubscribe callback."""
-        self.hass.add_job(self._mqtt_handle_mid, mid)
+        if granted_qos is not None:
+            self._granted_qos[mid] = tuple(granted_qos)
+        self._call_in_loop(self._mqtt_handle_mid, mid)
 
-    async def _mqtt_handle_mid(self, mid: int) -> None:
-        # Create the mid event if not created, either _mqtt_handle_mid or _wait_for_mid
-        # may be executed first.
-        await self._register_mid(mid)
-        self._pending_operations[mid].set()
+    @callback
+    def _mqtt_handle_mid(self, mid: int) -> None:
+        if mid in self._fire_and_forget_mids:
+            self._fire_and_forget_mids.discard(mid)
+            return
+        self._acks.ack(mid)
 
     async def async_publish(
             self, topic: str, payload: PublishPayloadType, qos: int, retain: bool
     ) -> None:
-        """Publish a MQTT message."""
-        async with self._paho_lock:
-            msg_info = await self.hass.async_add_executor_job(
-                self._client.publish, topic, payload, qos, retain
-            )
+        """Publish a MQTT message.
+
+        QoS 0 messages are handed to paho's outgoing buffer straight from the
+        event loop, there is no ACK to wait for so the executor hop is skipped.
+        """
+        if qos == 0:
+            self.publish_nowait(topic, payload, retain)
+            return
+        def _client_publish():
+            msg_info = self._client.publish(topic, payload, qos, retain)
             _raise_on_error(msg_info.rc)
+            self._call_in_loop(self._acks.register, msg_info.mid)
+            return msg_info
+
+        if self._loop_transport:
+            msg_info = _client_publish()
+        else:
+            async with self._paho_lock:
+                msg_info = await self.hass.async_add_executor_job(_client_publish)
         await self._wait_for_mid(msg_info.mid)
 
+    @callback
+    def publish_nowait(
+            self, topic: str, payload: PublishPayloadType, retain: bool = False
+    ) -> None:
+        """Queue a QoS 0 MQTT message without waiting for it to be sent."""
+        msg_info = self._client.publish(topic, payload, 0, retain)
+        _raise_on_error(msg_info.rc)
+        self._fire_and_forget_mids.add(msg_info.mid)
+
     async def _wait_for_mid(self, mid: int) -> None:
         """Wait for ACK from broker."""
-        # Create the mid event if not created, either _mqtt_handle_mid or _wait_for_mid
-        # may be executed first.
-        await self._register_mid(mid)
         try:
-            await asyncio.wait_for(self._pending_operations[mid].wait(), TIMEOUT_ACK)
+            await self._acks.async_wait(mid, TIMEOUT_ACK)
         except asyncio.TimeoutError:
             _LOGGER.warning(
                 "No ACK from MQTT server in %s seconds (mid: %s)", TIMEOUT_ACK, mid
             )
-        finally:
-            async with self._pending_operations_condition:
-                # Cleanup ACK sync buffer
-                del self._pending_operations[mid]
-                self._pending_operations_condition.notify_all()
-
-    async def _register_mid(self, mid: int) -> None:
-        """Create Event for an expected ACK."""
-        async with self._pending_operations_condition:
-            if mid not in self._pending_operations:
-                self._pending_operations[mid] = asyncio.Event()
@@ -3,13 +3,16 @@
 import logging
 from homeassistant.components.sensor import SensorEntity,SensorDeviceClass,SensorStateClass
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant, Event, callback
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.const import LIGHT_LUX,UnitOfElectricPotential,UnitOfElectricCurrent,UnitOfEnergy,UnitOfPower
+from homeassistant.const import LIGHT_LUX,UnitOfElectricPotential,UnitOfElectricCurrent,UnitOfEnergy,UnitOfPower, \
+    EVENT_HOMEASSISTANT_STOP
 
-from .const import DOMAIN, EVENT_ENTITY_REGISTER, EVENT_ENTITY_STATE_UPDATE, CACHE_ENTITY_STATE_UPDATE_KEY_DICT, MANUFACTURER
+from .const import DOMAIN, EVENT_ENTITY_REGISTER, MANUFACTURER
+from .entity import GeneralLinkEntity
+from .throttle import StateThrottle
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -40,17 +43,17 @@ async def async_setup_entry(
             raise
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
 
 
-class LightSensor(SensorEntity):
+class LightSensor(GeneralLinkEntity, SensorEntity):
     """用于处理光照传感器相关的业务逻辑的自定义实体类"""
 
     should_poll = False
-    0
+    _route_suffix = "L"
 
     def __init__(self, hass: HomeAssistant, config: dict, config_entry: ConfigEntry) -> None:
         self._attr_unique_id = config["unique_id"]+"L"
@@ -67,22 +70,6 @@ class LightSensor(SensorEntity):
         self.config_entry = config_entry
         self.update_state(config)
 
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception as e:
-            _LOGGER.error(f"更新传感器状态时出错: {e}")
-
     @property
     def device_info(self) -> DeviceInfo:
         """关于此实体/设备的信息"""
@@ -104,10 +91,72 @@ class LightSensor(SensorEntity):
             elif data["state"] == 0:
                 self._attr_available = False
 
-class VoltageSensor(SensorEntity):
+class ThrottledSensor(GeneralLinkEntity, SensorEntity):
+    """电能表传感器，按配置项限制状态写入频率，见 StateThrottle"""
+
+    _throttle: StateThrottle | None = None
+
+    _flush_handle = None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._throttle = StateThrottle(self.config_entry)
+        self._throttle.written(self._attr_native_value, self.hass.loop.time())
+        self.async_on_remove(
+            self.hass.bus.async_listen(EVENT_HOMEASSISTANT_STOP, self._async_flush_on_stop)
+        )
+
+    async def async_will_remove_from_hass(self) -> None:
+        """移除前写入尚未写入的值"""
+        if self._flush_handle is not None:
+            self._async_flush(batched=False)
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def async_handle_state(self, data: dict) -> None:
+        if not self.wants_state(data):
+            return
+        self.update_state(data)
+        if "state" in data:
+            # 可用性变化立即写入，变为不可用前的最后一个值也一并写入
+            self._async_flush()
+            return
+        now = self.hass.loop.time()
+        delay = self._throttle.delay(self._attr_native_value, now)
+        if delay is None:
+            # 又回到了已写入的值
+            self._async_cancel_flush()
+        elif delay == 0:
+            self._async_flush()
+        elif self._flush_handle is None or self._flush_handle.when() > now + delay:
+            self._async_cancel_flush()
+            self._flush_handle = self.hass.loop.call_later(delay, self._async_flush)
+
+    @callback
+    def _async_flush_on_stop(self, _event: Event) -> None:
+        if self._flush_handle is not None:
+            self._async_flush(batched=False)
+
+    @callback
+    def _async_cancel_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    @callback
+    def _async_flush(self, batched: bool = True) -> None:
+        self._async_cancel_flush()
+        self._throttle.written(self._attr_native_value, self.hass.loop.time())
+        if batched:
+            self.async_schedule_write()
+        else:
+            self.async_write_ha_state()
+
+class VoltageSensor(ThrottledSensor):
     """用于处理光照传感器相关的业务逻辑的自定义实体类"""
 
     should_poll = False
+    _route_suffix = "V"
     
 
     def __init__(self, hass: HomeAssistant, config: dict, config_entry: ConfigEntry) -> None:
@@ -125,22 +174,6 @@ class VoltageSensor(SensorEntity):
         self.config_entry = config_entry
         self.update_state(config)
 
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception as e:
-            _LOGGER.error(f"更新传感器状态时出错: {e}")
-
     @property
     def device_info(self) -> DeviceInfo:
         """关于此实体/设备的信息"""
@@ -164,10 +197,11 @@ class VoltageSensor(SensorEntity):
                 self._attr_available = False
 
 
-class CurrentSensor(SensorEntity):
+class CurrentSensor(ThrottledSensor):
     """用于处理光照传感器相关的业务逻辑的自定义实体类"""
 
     should_poll = False
+    _route_suffix = "C"
     
 
     def __init__(self, hass: HomeAssistant, config: dict, config_entry: ConfigEntry) -> None:
@@ -186,22 +220,6 @@ class CurrentSensor(SensorEntity):
         self.config_entry = config_entry
         self.update_state(config)
 
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception as e:
-            _LOGGER.error(f"更新传感器状态时出错: {e}")
-
     @property
     def device_info(self) -> DeviceInfo:
         """关于此实体/设备的信息"""
@@ -223,10 +241,11 @@ class CurrentSensor(SensorEntity):
             elif data["state"] == 0:
                 self._attr_available = False
 
-class EnergySensor(SensorEntity):
+class EnergySensor(ThrottledSensor):
     """用于处理光照传感器相关的业务逻辑的自定义实体类"""
 
     should_poll = False
+    _route_suffix = "E"
     
 
     def __init__(self, hass: HomeAssistant, config: dict, config_entry: ConfigEntry) -> None:
@@ -245,22 +264,6 @@ class EnergySensor(SensorEntity):
         self.config_entry = config_entry
         self.update_state(config)
 
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception as e:
-            _LOGGER.error(f"更新传感器状态时出错: {e}")
-
     @property
     def device_info(self) -> DeviceInfo:
         """关于此实体/设备的信息"""
@@ -282,10 +285,11 @@ class EnergySensor(SensorEntity):
             elif data["state"] == 0:
                self._attr_available = False
 
-class PowerA161Sensor(SensorEntity):
+class PowerA161Sensor(ThrottledSensor):
     """用于处理光照传感器相关的业务逻辑的自定义实体类"""
 
     should_poll = False
+    _route_suffix = "P"
     #device_class = SensorDeviceClass.ILLUMINANCE
 
     def __init__(self, hass: HomeAssistant, config: dict, config_entry: ConfigEntry) -> None:
@@ -303,22 +307,6 @@ class PowerA161Sensor(SensorEntity):
         self.config_entry = config_entry
         self.update_state(config)
 
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception as e:
-            _LOGGER.error(f"更新传感器状态时出错: {e}")
-
     @property
     def device_info(self) -> DeviceInfo:
         """关于此实体/设备的信息"""
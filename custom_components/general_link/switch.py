@@ -1,19 +1,20 @@
 """Business logic for switch entity."""
 from __future__ import annotations
 
-import json
 import logging
 from abc import ABC
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.core import HomeAssistant
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 
-from .const import DOMAIN, MQTT_CLIENT_INSTANCE, \
-    EVENT_ENTITY_REGISTER, EVENT_ENTITY_STATE_UPDATE, CACHE_ENTITY_STATE_UPDATE_KEY_DICT, MANUFACTURER
+from .const import DOMAIN, EVENT_ENTITY_REGISTER, MANUFACTURER
+from .codec import json_dumps
+from .entity import GeneralLinkEntity
+from .mqtt import get_mqtt_client
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -45,23 +46,26 @@ async def async_setup_entry(
                     relaysName = relaysNames[relay]
                     if relaysName.strip() == "":
                         relaysName = f"按键{relay+1}"
-                    config_payload["unique_id"] = f"switch{sn}{relay}"
-                    config_payload["relay"] = relay
-                    config_payload["dname"] = name
-                    config_payload["name"] = f"{name}-{relaysName}"
-                    config_payload["on"] = state
-                    async_add_entities([CustomSwitch(hass, config_payload, config_entry)])
+                    relay_payload = {
+                        **config_payload,
+                        "unique_id": f"switch{sn}{relay}",
+                        "relay": relay,
+                        "dname": name,
+                        "name": f"{name}-{relaysName}",
+                        "on": state,
+                    }
+                    async_add_entities([CustomSwitch(hass, relay_payload, config_entry)])
         except Exception:
             raise
 
     unsub = async_dispatcher_connect(
-        hass, EVENT_ENTITY_REGISTER.format(COMPONENT), async_discover
+        hass, EVENT_ENTITY_REGISTER.format(COMPONENT, config_entry.entry_id), async_discover
     )
 
     config_entry.async_on_unload(unsub)
 
 
-class CustomSwitch(SwitchEntity, ABC):
+class CustomSwitch(GeneralLinkEntity, SwitchEntity, ABC):
     """Custom entity class to handle business logic related to switchs"""
 
     should_poll = False
@@ -95,24 +99,6 @@ class CustomSwitch(SwitchEntity, ABC):
 
         self.update_state(config)
 
-        """Add a device state change event listener, and execute the specified method when the device state changes. 
-        Note: It is necessary to determine whether an event listener has been added here to avoid repeated additions."""
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.unique_id)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception:
-            raise
-
     @property
     def device_info(self) -> DeviceInfo:
         """Information about this entity/device."""
@@ -130,6 +116,17 @@ class CustomSwitch(SwitchEntity, ABC):
         """Return true if switch is on."""
         return self._state
 
+    def wants_state(self, data: dict) -> bool:
+        """Only the relay of this switch is read, and only when it changed"""
+        if "state" in data:
+            return True
+        relays = data.get("relays")
+        return (
+            relays is not None
+            and self.relay < len(relays)
+            and (relays[self.relay] != 0) != self._state
+        )
+
     def update_state(self, data):
         """Switch event reporting changes the switch state in HA"""
         if "on" in data:
@@ -137,6 +134,9 @@ class CustomSwitch(SwitchEntity, ABC):
                 self._state = False
             else:
                 self._state = True
+        relays = data.get("relays")
+        if relays is not None and self.relay < len(relays):
+            self._state = relays[self.relay] != 0
         if "state" in data:
             if data["state"] == 1:
                 self._attr_available = True
@@ -171,15 +171,16 @@ class CustomSwitch(SwitchEntity, ABC):
         message["data"]["relay"] = self.relay
         message["data"]["sn"] = self.sn
         message["data"]["state"] = int(on)
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        self.async_invalidate_state()
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q68",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
 
 
-class CustomSwitchA41(SwitchEntity, ABC):
+class CustomSwitchA41(GeneralLinkEntity, SwitchEntity, ABC):
     """Custom entity class to handle business logic related to switchs"""
 
     should_poll = False
@@ -213,24 +214,6 @@ class CustomSwitchA41(SwitchEntity, ABC):
 
         self.update_state(config)
 
-        """Add a device state change event listener, and execute the specified method when the device state changes. 
-        Note: It is necessary to determine whether an event listener has been added here to avoid repeated additions."""
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.sn)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception:
-            raise
-
     @property
     def device_info(self) -> DeviceInfo:
         """Information about this entity/device."""
@@ -295,13 +278,14 @@ class CustomSwitchA41(SwitchEntity, ABC):
             }
         }
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        self.async_invalidate_state()
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q74",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
-class CustomSwitchA121(SwitchEntity, ABC):
+class CustomSwitchA121(GeneralLinkEntity, SwitchEntity, ABC):
     """Custom entity class to handle business logic related to switchs"""
 
     should_poll = False
@@ -333,24 +317,6 @@ class CustomSwitchA121(SwitchEntity, ABC):
 
         self.update_state(config)
 
-        """Add a device state change event listener, and execute the specified method when the device state changes. 
-        Note: It is necessary to determine whether an event listener has been added here to avoid repeated additions."""
-        key = EVENT_ENTITY_STATE_UPDATE.format(self.sn)
-        if key not in hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT]:
-            unsub = async_dispatcher_connect(
-                hass, key, self.async_discover
-            )
-            hass.data[CACHE_ENTITY_STATE_UPDATE_KEY_DICT][key] = unsub
-            config_entry.async_on_unload(unsub)
-
-    @callback
-    def async_discover(self, data: dict) -> None:
-        try:
-            self.update_state(data)
-            self.async_write_ha_state()
-        except Exception:
-            raise
-
     @property
     def device_info(self) -> DeviceInfo:
         """Information about this entity/device."""
@@ -415,9 +381,10 @@ class CustomSwitchA121(SwitchEntity, ABC):
             }
         }
 
-        await self.hass.data[MQTT_CLIENT_INSTANCE].async_publish(
+        self.async_invalidate_state()
+        await get_mqtt_client(self.hass, self.config_entry).async_publish(
             f"P/{self.mqttAddr}/center/q74",
-            json.dumps(message),
+            json_dumps(message),
             0,
             False
         )
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Rate limit and deadband the state writes of high-rate sensors."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .const import (
+    CONF_SENSOR_ABS_DEADBAND,
+    CONF_SENSOR_MAX_INTERVAL,
+    CONF_SENSOR_MIN_INTERVAL,
+    CONF_SENSOR_REL_DEADBAND,
+    DEFAULT_SENSOR_ABS_DEADBAND,
+    DEFAULT_SENSOR_MAX_INTERVAL,
+    DEFAULT_SENSOR_MIN_INTERVAL,
+    DEFAULT_SENSOR_REL_DEADBAND,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+
+
+class StateThrottle:
+    """Decide when the reported value of a sensor is written to HA.
+
+    A value outside the deadband of the last written one is written at most
+    once per minimum interval. A value inside the deadband is written once
+    the last write is older than the maximum interval. The limits are read
+    from the config entry options on every report, so option changes apply
+    without reloading the entity.
+    """
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        self._config_entry = config_entry
+        self._value = None
+        self._written_at: float | None = None
+
+    def written(self, value, now: float) -> None:
+        """Record that value was written at loop time now"""
+        self._value = value
+        self._written_at = now
+
+    def delay(self, value, now: float) -> float | None:
+        """Return seconds until value must be written, None if it is already written"""
+        if self._written_at is None:
+            return 0
+        if value == self._value:
+            return None
+        options = self._config_entry.options
+        if self._outside_deadband(value, options):
+            interval = options.get(CONF_SENSOR_MIN_INTERVAL, DEFAULT_SENSOR_MIN_INTERVAL)
+        else:
+            interval = options.get(CONF_SENSOR_MAX_INTERVAL, DEFAULT_SENSOR_MAX_INTERVAL)
+        return max(0, self._written_at + interval - now)
+
+    def _outside_deadband(self, value, options) -> bool:
+        try:
+            change = abs(float(value) - float(self._value))
+            reference = abs(float(self._value))
+        except (TypeError, ValueError):
+            return True
+        deadband = max(
+            options.get(CONF_SENSOR_ABS_DEADBAND, DEFAULT_SENSOR_ABS_DEADBAND),
+            reference * options.get(CONF_SENSOR_REL_DEADBAND, DEFAULT_SENSOR_REL_DEADBAND) / 100,
+        )
+        return change > deadband
@@ -0,0 +1,166 @@
+"""Incremental MQTT topic trie used to match inbound topics to subscriptions."""
+from __future__ import annotations
+
+from typing import Any
+
+MULTI_LEVEL_WILDCARD = "#"
+
+SINGLE_LEVEL_WILDCARD = "+"
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """Return True if the topic is covered by the topic filter (MQTT 3.1.1 rules)."""
+    if topic.startswith("$") and topic_filter[:1] in (SINGLE_LEVEL_WILDCARD, MULTI_LEVEL_WILDCARD):
+        return False
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == MULTI_LEVEL_WILDCARD:
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != SINGLE_LEVEL_WILDCARD and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def filter_covers(topic_filter: str, other: str) -> bool:
+    """Return True if every topic matched by other is also matched by topic_filter."""
+    if other.endswith(MULTI_LEVEL_WILDCARD) and not topic_filter.endswith(MULTI_LEVEL_WILDCARD):
+        return False
+    # Wildcards in other are taken literally, so '+' is only covered by '+' or '#'
+    return topic_matches(topic_filter, other)
+
+
+def reduce_topic_filters(topic_filters: list[str]) -> list[str]:
+    """Drop duplicate filters and filters covered by another one, keeping order."""
+    unique = list(dict.fromkeys(topic_filters))
+    return [
+        topic_filter
+        for topic_filter in unique
+        if not any(
+            other != topic_filter and filter_covers(other, topic_filter)
+            for other in unique
+        )
+    ]
+
+
+class _TrieNode:
+    """One topic level of the trie."""
+
+    __slots__ = ("children", "values", "multi_values")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _TrieNode] = {}
+        # Values whose filter ends exactly at this level
+        self.values: list[Any] = []
+        # Values whose filter ends with '#' right below this level
+        self.multi_values: list[Any] = []
+
+    def is_empty(self) -> bool:
+        return not (self.children or self.values or self.multi_values)
+
+
+class TopicTrie:
+    """Map MQTT topic filters to values and look up every value matching a topic.
+
+    Lookup cost grows with the topic depth instead of the number of filters.
+    Results are cached per topic; adding or removing a filter only evicts the
+    cached topics that filter covers.
+    """
+
+    def __init__(self, cache_size: int = 2048) -> None:
+        self._root = _TrieNode()
+        self._cache: dict[str, list[Any]] = {}
+        self._cache_size = cache_size
+
+    def add(self, topic_filter: str, value: Any) -> None:
+        """Register a value under a topic filter."""
+        levels = topic_filter.split("/")
+        node = self._root
+        for level in levels[:-1]:
+            node = node.children.setdefault(level, _TrieNode())
+        if levels[-1] == MULTI_LEVEL_WILDCARD:
+            node.multi_values.append(value)
+        else:
+            node = node.children.setdefault(levels[-1], _TrieNode())
+            node.values.append(value)
+        self._invalidate(topic_filter)
+
+    def remove(self, topic_filter: str, value: Any) -> bool:
+        """Remove a value registered under a topic filter, return False if absent."""
+        levels = topic_filter.split("/")
+        path: list[tuple[_TrieNode, str]] = []
+        node = self._root
+        for level in levels[:-1]:
+            child = node.children.get(level)
+            if child is None:
+                return False
+            path.append((node, level))
+            node = child
+
+        if levels[-1] == MULTI_LEVEL_WILDCARD:
+            bucket = node.multi_values
+        else:
+            child = node.children.get(levels[-1])
+            if child is None:
+                return False
+            path.append((node, levels[-1]))
+            node = child
+            bucket = node.values
+
+        if value not in bucket:
+            return False
+        bucket.remove(value)
+
+        # Prune branches that no longer lead to any value
+        for parent, level in reversed(path):
+            if not parent.children[level].is_empty():
+                break
+            del parent.children[level]
+
+        self._invalidate(topic_filter)
+        return True
+
+    def match(self, topic: str) -> list[Any]:
+        """Return every value whose topic filter covers the topic."""
+        if (cached := self._cache.get(topic)) is not None:
+            return cached
+
+        levels = topic.split("/")
+        depth = len(levels)
+        # Wildcards at the first level never match topics starting with '$'
+        allow_wildcards = not topic.startswith("$")
+        result: list[Any] = []
+        stack: list[tuple[_TrieNode, int]] = [(self._root, 0)]
+        while stack:
+            node, index = stack.pop()
+            if index > 0 or allow_wildcards:
+                result.extend(node.multi_values)
+            if index == depth:
+                result.extend(node.values)
+                continue
+            if (child := node.children.get(levels[index])) is not None:
+                stack.append((child, index + 1))
+            if (index > 0 or allow_wildcards) and (
+                child := node.children.get(SINGLE_LEVEL_WILDCARD)
+            ) is not None:
+                stack.append((child, index + 1))
+
+        if len(self._cache) >= self._cache_size:
+            # Drop the oldest cached topic
+            del self._cache[next(iter(self._cache))]
+        self._cache[topic] = result
+        return result
+
+    def cache_clear(self) -> None:
+        """Forget every cached lookup."""
+        self._cache.clear()
+
+    def _invalidate(self, topic_filter: str) -> None:
+        """Evict cached lookups for the topics covered by a filter."""
+        if SINGLE_LEVEL_WILDCARD not in topic_filter and MULTI_LEVEL_WILDCARD not in topic_filter:
+            self._cache.pop(topic_filter, None)
+            return
+        for topic in [topic for topic in self._cache if topic_matches(topic_filter, topic)]:
+            del self._cache[topic]
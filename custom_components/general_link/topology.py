@@ -0,0 +1,27 @@
+"""Persisted gateway topology, used to create entities before the gateway answers."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+TOPOLOGY_STORAGE_VERSION = 1
+
+# Seconds to collect topology changes before writing them to disk
+TOPOLOGY_SAVE_DELAY = 10
+
+
+class TopologyStore(Store):
+    """Rooms, light groups, scenes, automations and entities of one gateway."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        super().__init__(hass, TOPOLOGY_STORAGE_VERSION, f"{DOMAIN}.topology.{entry_id}")
+
+    async def _async_migrate_func(
+            self, old_major_version: int, old_minor_version: int, old_data: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Discard snapshots of another layout, the next sync saves a new one."""
+        return {}
@@ -0,0 +1,87 @@
+"""Helpers for the tests that run against a Home Assistant instance.
+
+These tests skip themselves when Home Assistant is not installed. They use
+a bare HomeAssistant object, not a configured instance, so the integration
+is exercised without being set up through the config entry flow.
+"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+GATEWAY_DATA = {
+    "name": "gateway",
+    "mqttAddr": "gw1",
+    "broker": "127.0.0.1",
+    "port": 1883,
+    "username": "user",
+    "password": "password",
+    "light_device_type": "single",
+}
+
+
+async def async_test_home_assistant(config_dir):
+    """Return a HomeAssistant object running on the current event loop."""
+    from homeassistant.core import HomeAssistant
+
+    hass = HomeAssistant(str(config_dir))
+    hass.data.setdefault("general_link", {})
+    return hass
+
+
+class ConfigEntryStub(SimpleNamespace):
+    """The parts of a ConfigEntry the gateway and its client use."""
+
+    def __init__(self, data: dict | None = None, options: dict | None = None, entry_id="entry1"):
+        super().__init__(
+            data=dict(GATEWAY_DATA if data is None else data),
+            options=dict(options or {}),
+            entry_id=entry_id,
+            unload_callbacks=[],
+        )
+
+    def async_on_unload(self, func) -> None:
+        self.unload_callbacks.append(func)
+
+    def async_create_background_task(self, hass, target, name):
+        return hass.async_create_background_task(target, name)
+
+
+class FakePahoClient:
+    """Stand-in for the paho client that records publishes and ACKs them."""
+
+    def __init__(self, mqtt_client) -> None:
+        self._mqtt_client = mqtt_client
+        self._loop = mqtt_client.hass.loop
+        self._mid = 0
+        self.published: list[tuple] = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self._mid += 1
+        self.published.append((topic, payload, qos, retain))
+        # The broker's ACK is read by the network loop after publish returned
+        self._loop.call_soon_threadsafe(
+            self._loop.call_soon, self._mqtt_client._mqtt_on_callback, None, None, self._mid
+        )
+        return SimpleNamespace(rc=0, mid=self._mid)
+
+    def disconnect(self):
+        return 0
+
+
+def mqtt_client_with_fake_paho(hass, config_entry, **kwargs):
+    """Return a connected MqttClient whose paho client is a FakePahoClient."""
+    from custom_components.general_link.mqtt import MqttClient
+
+    mqtt_client = MqttClient(hass, config_entry, config_entry.data, **kwargs)
+    mqtt_client._client = FakePahoClient(mqtt_client)
+    mqtt_client.connected = True
+    return mqtt_client
+
+
+def mqtt_message(topic: str, payload: bytes):
+    """Return a paho message as the network loop hands it over."""
+    from paho.mqtt.client import MQTTMessage
+
+    msg = MQTTMessage(topic=topic.encode())
+    msg.payload = payload
+    return msg
@@ -0,0 +1,21 @@
+"""Load the pure helper modules of the integration without Home Assistant.
+
+The package __init__ sets up the integration and imports Home Assistant, the
+modules tested here only import each other. They are loaded as submodules of
+a bare package object so that importing them does not run the __init__.
+"""
+import sys
+import types
+from pathlib import Path
+
+PACKAGE = "custom_components.general_link"
+PACKAGE_DIR = Path(__file__).resolve().parents[1] / "custom_components" / "general_link"
+
+if PACKAGE not in sys.modules:
+    for name, path in (
+            ("custom_components", PACKAGE_DIR.parent),
+            (PACKAGE, PACKAGE_DIR),
+    ):
+        module = types.ModuleType(name)
+        module.__path__ = [str(path)]
+        sys.modules[name] = module
@@ -0,0 +1,116 @@
+"""Tests for the MQTT ACK tracker."""
+import asyncio
+
+import pytest
+
+from custom_components.general_link.ack import AckTracker
+
+from .common import ConfigEntryStub, async_test_home_assistant, mqtt_client_with_fake_paho
+
+
+def test_ack_resolves_the_waiter():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop())
+        tracker.register(1)
+        asyncio.get_running_loop().call_soon(tracker.ack, 1)
+        await tracker.async_wait(1, 1)
+        return tracker
+
+    tracker = asyncio.run(run())
+    assert len(tracker) == 0
+    assert sum(tracker.stats["wait_histogram"].values()) == 1
+
+
+def test_ack_before_wait():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop())
+        tracker.register(1)
+        tracker.ack(1)
+        await tracker.async_wait(1, 0)
+        return tracker
+
+    assert len(asyncio.run(run())) == 0
+
+
+def test_ack_before_register():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop())
+        # The network thread queued the ACK before the executor job its register
+        tracker.ack(1)
+        tracker.register(1)
+        await tracker.async_wait(1, 0)
+        return tracker
+
+    tracker = asyncio.run(run())
+    assert len(tracker) == 0
+    assert tracker.early == 1
+    assert tracker.unexpected == 0
+
+
+def test_stale_early_ack_is_dropped():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop(), early_ack_ttl=0.01)
+        tracker.ack(1)
+        await asyncio.sleep(0.02)
+        tracker.register(1)
+        with pytest.raises(asyncio.TimeoutError):
+            await tracker.async_wait(1, 0.01)
+        return tracker
+
+    tracker = asyncio.run(run())
+    assert tracker.early == 0
+    assert tracker.unexpected == 1
+
+
+def test_timeout_and_late_ack():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop())
+        tracker.register(1)
+        with pytest.raises(asyncio.TimeoutError):
+            await tracker.async_wait(1, 0.01)
+        tracker.ack(1)
+        return tracker
+
+    tracker = asyncio.run(run())
+    assert len(tracker) == 0
+    assert tracker.timeouts == 1
+    assert tracker.unexpected == 1
+
+
+def test_reused_mid_waits_for_its_own_ack():
+    async def run():
+        tracker = AckTracker(asyncio.get_running_loop())
+        tracker.register(7)
+        with pytest.raises(asyncio.TimeoutError):
+            await tracker.async_wait(7, 0.01)
+        # Late ACK of the timed out packet, then paho hands out the same mid again
+        tracker.ack(7)
+        tracker.register(7)
+        with pytest.raises(asyncio.TimeoutError):
+            await tracker.async_wait(7, 0.01)
+
+    asyncio.run(run())
+
+
+def test_threaded_publishes_get_their_ack(tmp_path):
+    """With paho's network thread ACKs may overtake the register call."""
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            mqtt_client = mqtt_client_with_fake_paho(
+                hass, ConfigEntryStub(), loop_transport=False
+            )
+            for level in range(50):
+                await asyncio.wait_for(
+                    mqtt_client.async_publish("P/gw1/center/q20", b"%d" % level, 1, False), 1
+                )
+            return mqtt_client.ack_stats
+        finally:
+            await hass.async_stop(force=True)
+
+    stats = asyncio.run(run())
+    assert stats["outstanding"] == 0
+    assert stats["timeouts"] == 0
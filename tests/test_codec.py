@@ -0,0 +1,96 @@
+"""Tests and a parse / serialize benchmark of the JSON codec."""
+import json
+import time
+
+import pytest
+
+from custom_components.general_link import codec
+from custom_components.general_link.codec import json_dumps, json_loads
+
+PAGES = 20
+BURST = 500
+
+
+def _device_page(start, count=100):
+    """A p5 page as the gateway answers a q5 request."""
+    devices = [
+        {
+            "sn": f"{start + index:012x}",
+            "name": f"客厅灯{start + index}",
+            "devType": 1,
+            "model": "ILight2-S1",
+            "room": index % 12,
+            "subgroup": index % 4,
+            "on": 1,
+            "level": 40,
+            "kelvin": 3000,
+            "rgb": 16777215,
+            "relays": [1, 0],
+        }
+        for index in range(count)
+    ]
+    data = {"start": start, "count": count, "total": PAGES * count, "list": devices}
+    return json.dumps({"seq": 1, "data": data}, ensure_ascii=False).encode() + b"\x00"
+
+
+def _event_burst():
+    return [
+        json.dumps({"seq": 0, "data": [{"sn": f"{index:012x}", "on": index % 2}]}).encode()
+        for index in range(BURST)
+    ]
+
+
+def _commands():
+    return [
+        {"seq": 1, "rspTo": "general_link/gw1", "data": {"sn": f"{index:012x}", "level": index % 100}}
+        for index in range(BURST)
+    ]
+
+
+def _best_of(func, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def test_round_trip():
+    page = _device_page(0, 3)
+    assert json_loads(page.rstrip(b"\x00")) == json.loads(page.rstrip(b"\x00").decode())
+    command = {"seq": 1, "data": {"name": "客厅", 1: "a"}}
+    assert json_loads(json_dumps(command)) == {"seq": 1, "data": {"name": "客厅", "1": "a"}}
+    assert isinstance(json_dumps(command), bytes)
+
+
+def test_benchmark_codec_against_stdlib():
+    pages = [_device_page(start * 100).rstrip(b"\x00") for start in range(PAGES)]
+    events = _event_burst()
+    commands = _commands()
+
+    timings = {
+        "parse pages": (
+            _best_of(lambda: [json.loads(page.decode()) for page in pages]),
+            _best_of(lambda: [json_loads(page) for page in pages]),
+        ),
+        "parse events": (
+            _best_of(lambda: [json.loads(event.decode()) for event in events]),
+            _best_of(lambda: [json_loads(event) for event in events]),
+        ),
+        "serialize commands": (
+            _best_of(lambda: [json.dumps(command).encode() for command in commands]),
+            _best_of(lambda: [json_dumps(command) for command in commands]),
+        ),
+    }
+    backend = "orjson" if codec.orjson is not None else "stdlib json"
+    print(
+        f"\n{PAGES} p5 pages of 100 devices, {BURST} events and commands, codec on {backend}:"
+    )
+    for name, (stdlib, fast) in timings.items():
+        print(f"  {name}: stdlib {stdlib * 1000:.2f} ms, codec {fast * 1000:.2f} ms")
+
+    if codec.orjson is None:
+        pytest.skip("orjson is not installed, the codec is the stdlib")
+    for stdlib, fast in timings.values():
+        assert fast < stdlib
@@ -0,0 +1,62 @@
+"""Tests for matching gateway responses to requests."""
+import asyncio
+
+from custom_components.general_link.correlator import RequestCorrelator
+
+
+def test_response_resolves_only_its_key():
+    async def run():
+        correlator = RequestCorrelator(asyncio.get_running_loop())
+        page_0 = correlator.expect(("p5", 1, 0))
+        page_1 = correlator.expect(("p5", 1, 1))
+
+        assert correlator.resolve(("p5", 1, 1), "second")
+        assert not page_0.done()
+        assert page_1.result() == "second"
+        assert not correlator.resolve(("p5", 2, 0), "other seq")
+        assert not page_0.done()
+
+    asyncio.run(run())
+
+
+def test_same_key_is_answered_in_order():
+    async def run():
+        correlator = RequestCorrelator(asyncio.get_running_loop())
+        first = correlator.expect(("p82", 1))
+        second = correlator.expect(("p82", 1))
+
+        correlator.resolve(("p82", 1), "a")
+        correlator.resolve(("p82", 1), "b")
+        assert (first.result(), second.result()) == ("a", "b")
+        assert not correlator.resolve(("p82", 1), "c")
+
+    asyncio.run(run())
+
+
+def test_discarded_waiter_is_skipped():
+    async def run():
+        correlator = RequestCorrelator(asyncio.get_running_loop())
+        timed_out = correlator.expect(("p5", 3, 0))
+        waiting = correlator.expect(("p5", 3, 0))
+        correlator.discard(("p5", 3, 0), timed_out)
+        # Discarding twice is harmless
+        correlator.discard(("p5", 3, 0), timed_out)
+
+        assert correlator.resolve(("p5", 3, 0), "page")
+        assert not timed_out.done()
+        assert waiting.result() == "page"
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_is_skipped():
+    async def run():
+        correlator = RequestCorrelator(asyncio.get_running_loop())
+        cancelled = correlator.expect(("p5", 1, 0))
+        waiting = correlator.expect(("p5", 1, 0))
+        cancelled.cancel()
+
+        assert correlator.resolve(("p5", 1, 0), "page")
+        assert waiting.result() == "page"
+
+    asyncio.run(run())
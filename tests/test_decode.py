@@ -0,0 +1,87 @@
+"""Benchmark of the payload decoding of overlapping subscriptions."""
+import asyncio
+import json
+import time
+
+import pytest
+
+from .common import ConfigEntryStub, async_test_home_assistant, mqtt_message
+
+MESSAGES = 200
+
+
+def _event_payload(size):
+    """An event/3 payload of about size bytes, NUL padded like the gateway sends it."""
+    states = []
+    while len(json.dumps({"data": states})) < size:
+        states.append({"sn": f"{len(states):012x}", "on": 1, "level": 40, "kelvin": 3000})
+    return json.dumps({"data": states}).encode() + b"\x00\x00"
+
+
+def _previous_handle_message(mqtt_client, msg, subscriptions):
+    """The previous loop, stripping and decoding again for every subscription."""
+    from homeassistant.components.mqtt import ReceiveMessage
+
+    for subscription in subscriptions:
+        msg.payload = msg.payload.rstrip(b"\x00")
+        payload = msg.payload.decode(subscription.encoding)
+        mqtt_client.hass.async_run_hass_job(
+            subscription.job,
+            ReceiveMessage(msg.topic, payload, msg.qos, msg.retain, subscription.topic, None),
+        )
+
+
+@pytest.mark.parametrize("size", [4 * 1024, 64 * 1024])
+def test_benchmark_decode_once_per_message(tmp_path, size):
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    from homeassistant.core import callback
+
+    from custom_components.general_link.mqtt import MqttClient
+
+    payload = _event_payload(size)
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            entry = ConfigEntryStub()
+            mqtt_client = MqttClient(hass, entry, entry.data)
+            received = []
+
+            @callback
+            def receive(msg):
+                received.append(msg.payload)
+
+            # The gateway's own event topic and the one of every gateway overlap
+            await mqtt_client.async_subscribe_bulk(
+                ["p/gw1/event/3", "p/+/event/3"], receive, 0, "utf-8"
+            )
+            subscriptions = mqtt_client._matching_subscriptions("p/gw1/event/3")
+            assert len(subscriptions) == 2
+
+            timings = {}
+            for name, handle in (
+                ("per subscription", lambda msg: _previous_handle_message(mqtt_client, msg, subscriptions)),
+                ("once per message", lambda msg: mqtt_client._mqtt_handle_message(msg, subscriptions, 0)),
+            ):
+                messages = [mqtt_message("p/gw1/event/3", payload) for _ in range(MESSAGES)]
+                received.clear()
+                started = time.perf_counter()
+                for msg in messages:
+                    handle(msg)
+                timings[name] = time.perf_counter() - started
+            return timings, received, messages
+        finally:
+            await hass.async_stop(force=True)
+
+    timings, received, messages = asyncio.run(run())
+    print(
+        f"\n{MESSAGES} messages of {len(payload) // 1024} KB, 2 subscriptions: "
+        + ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items())
+    )
+    assert len(received) == 2 * MESSAGES
+    assert received[0] is received[1]
+    assert received[0] == payload.rstrip(b"\x00").decode()
+    # The raw payload is handed on as received
+    assert messages[0].payload == payload
+    assert timings["once per message"] < timings["per subscription"]
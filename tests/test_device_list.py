@@ -0,0 +1,139 @@
+"""Tests of the q5 device list requests of the gateway."""
+import asyncio
+import copy
+import json
+import time
+
+import pytest
+
+from .common import ConfigEntryStub, FakePahoClient, async_test_home_assistant, mqtt_message
+
+
+def _device_page(seq, start, count, total):
+    devices = [{"sn": f"sn{index}", "devType": 1, "on": 1} for index in range(start, start + count)]
+    data = {"start": start, "count": count, "total": total, "list": devices}
+    return json.dumps({"seq": seq, "data": data}).encode()
+
+
+def _q5_requests(gateway):
+    requests = []
+    for topic, payload, _qos, _retain in gateway.mqtt_client._client.published:
+        if topic.endswith("/center/q5"):
+            payload = json.loads(payload)
+            requests.append((payload["seq"], payload["data"]["start"]))
+    return requests
+
+
+def test_state_lookup_reply_does_not_answer_the_state_refresh(tmp_path):
+    """A lookup of two sns answered right after a reconnect must not end the refresh."""
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    from custom_components.general_link.Gateway import (
+        STATE_LOOKUP_SEQ,
+        STATE_REFRESH_SEQ,
+        Gateway,
+    )
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            gateway = Gateway(hass, ConfigEntryStub())
+            gateway.mqtt_client._client = FakePahoClient(gateway.mqtt_client)
+            gateway.mqtt_client.connected = True
+            handled = []
+
+            async def record(topic, payload):
+                handled.append((payload["seq"], payload["data"]["start"]))
+
+            refresh = hass.async_create_task(
+                gateway._async_fetch_device_list({"devTypes": [1]}, STATE_REFRESH_SEQ)
+            )
+            await asyncio.sleep(0)
+            for payload in (
+                _device_page(STATE_LOOKUP_SEQ, 0, 2, 2),
+                _device_page(STATE_REFRESH_SEQ, 0, 50, 150),
+            ):
+                await gateway._async_mqtt_subscribe(
+                    mqtt_message("P/gw1/center/p5", payload), handler=record
+                )
+            await asyncio.sleep(0.01)
+            requests = _q5_requests(gateway)
+            refresh.cancel()
+            return handled, requests
+        finally:
+            await hass.async_stop(force=True)
+
+    handled, requests = asyncio.run(run())
+    assert handled == [(STATE_LOOKUP_SEQ, 0), (STATE_REFRESH_SEQ, 0)]
+    assert requests[0] == (STATE_REFRESH_SEQ, 0)
+    # The refresh went on after its first page instead of taking the lookup's total
+    assert (STATE_REFRESH_SEQ, 50) in requests
+
+
+def _site_devices(count):
+    """Lights, curtains and sensors of a site, as listed in p5 pages."""
+    devices = []
+    for index in range(count):
+        device = {"sn": f"{index:012x}", "name": f"device {index}", "model": "m1", "state": 1,
+                  "room": index % 20, "subgroup": index % 4}
+        if index % 3 == 0:
+            device.update(devType=1, on=1, level=40, kelvin=3000, rgb=0)
+        elif index % 3 == 1:
+            device.update(devType=3, travel=50)
+        else:
+            device.update(devType=7, a14=120, a15=0)
+        devices.append(device)
+    return devices
+
+
+def test_benchmark_reconnect_reconciliation(tmp_path):
+    """A reconnect of a 500-device site registers nothing already known."""
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+    from custom_components.general_link.Gateway import Gateway
+    from custom_components.general_link.const import EVENT_ENTITY_REGISTER
+
+    devices = _site_devices(500)
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            entry = ConfigEntryStub()
+            gateway = Gateway(hass, entry)
+            gateway.mqtt_client._client = FakePahoClient(gateway.mqtt_client)
+            gateway.mqtt_client.connected = True
+            registered = []
+            for component in ("light", "cover", "sensor", "binary_sensor"):
+                async_dispatcher_connect(
+                    hass,
+                    EVENT_ENTITY_REGISTER.format(component, entry.entry_id),
+                    registered.append,
+                )
+
+            async def sync():
+                registered.clear()
+                started = time.process_time()
+                await gateway.report_q5_init(copy.deepcopy(devices))
+                await gateway._async_reconcile_topology(complete=True)
+                await hass.async_block_till_done()
+                return len(registered), time.process_time() - started
+
+            results = {"first sync": await sync(), "reconnect": await sync()}
+            # Before, nothing was known on reconnect and every device was registered again
+            gateway._known_entities.clear()
+            gateway._known_sns.clear()
+            results["reconnect, every device registered"] = await sync()
+            return results
+        finally:
+            await hass.async_stop(force=True)
+
+    results = asyncio.run(run())
+    print(f"\n{len(devices)} devices:")
+    for name, (count, seconds) in results.items():
+        print(f"  {name}: {count} registrations, {seconds * 1000:.1f} ms CPU")
+    entities = results["first sync"][0]
+    assert entities > len(devices)
+    assert results["reconnect"][0] == 0
+    assert results["reconnect, every device registered"][0] == entities
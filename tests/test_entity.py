@@ -0,0 +1,187 @@
+"""Tests of the state routing and batched state writes of the entities."""
+import asyncio
+import time
+
+import pytest
+
+from .common import GATEWAY_DATA, ConfigEntryStub, async_test_home_assistant
+
+
+class RecordingEntity:
+    """The parts of a GeneralLinkEntity the state router uses."""
+
+    def __init__(self, route_key, fail=False):
+        self.entity_id = f"light.{route_key}"
+        self.route_key = route_key
+        self.fail = fail
+        self.states = []
+
+    def async_handle_state(self, data):
+        if self.fail:
+            raise KeyError("level")
+        self.states.append(data)
+
+
+def test_failing_entity_does_not_stop_the_others(caplog):
+    pytest.importorskip("homeassistant.helpers.entity")
+    from custom_components.general_link.entity import StateRouter
+
+    router = StateRouter()
+    failing = RecordingEntity("sn1", fail=True)
+    others = [RecordingEntity("sn1"), RecordingEntity("sn1")]
+    for entity in (failing, *others):
+        router.async_register(entity)
+
+    router.async_dispatch("sn1", {"sn": "sn1", "a14": 10})
+
+    assert [entity.states for entity in others] == [[{"sn": "sn1", "a14": 10}]] * 2
+    assert "Error updating light.sn1" in caplog.text
+
+
+def test_states_follow_the_fanout_table(tmp_path):
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    from custom_components.general_link.Gateway import Gateway
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            gateway = Gateway(hass, ConfigEntryStub())
+            # Energy meter: relay, voltage and power entities
+            meter = {suffix: RecordingEntity(f"m1{suffix}") for suffix in ("", "V", "P")}
+            # A sensor not registered yet, its entities are guessed from the fields
+            motion = RecordingEntity("s1M")
+            for entity in (*meter.values(), motion):
+                gateway.state_router.async_register(entity)
+            gateway._compile_fanout_route("m1", 20)
+
+            await gateway._exec_event_3({"sn": "m1", "a161": 5})
+            await gateway._exec_event_3({"sn": "m1", "a41": 1, "a155": 230})
+            await gateway._exec_event_3({"sn": "m1", "state": 0})
+            await gateway._exec_event_3({"sn": "s1", "a15": 1})
+            return meter, motion
+        finally:
+            await hass.async_stop(force=True)
+
+    meter, motion = asyncio.run(run())
+    assert meter["P"].states == [{"a161": 5}, {"state": 0}]
+    assert meter["V"].states == [{"a155": 230}, {"state": 0}]
+    assert meter[""].states == [{"a41": 1}, {"state": 0}]
+    assert motion.states == [{"sn": "s1", "a15": 1}]
+
+
+def test_light_groups_of_two_gateways_do_not_share_states(tmp_path):
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    from custom_components.general_link.Gateway import Gateway
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            groups = []
+            gateways = []
+            for index in range(2):
+                entry = ConfigEntryStub(
+                    {**GATEWAY_DATA, "mqttAddr": f"gw{index}"}, entry_id=f"entry{index}"
+                )
+                gateway = Gateway(hass, entry)
+                # Both gateways have a group 0 in room 0
+                group = RecordingEntity("0-0")
+                gateway.state_router.async_register(group)
+                gateways.append(gateway)
+                groups.append(group)
+            await gateways[0]._event_trigger(0, 0, {"on": 1, "level": 50})
+            return groups
+        finally:
+            await hass.async_stop(force=True)
+
+    groups = asyncio.run(run())
+    assert groups[0].states == [{"on": 1, "level": 50.0}]
+    assert groups[1].states == []
+
+
+
+class WritingEntity:
+    """An entity that writes its brightness to the state machine."""
+
+    def __init__(self, hass, index):
+        self.hass = hass
+        self.entity_id = f"light.light_{index}"
+        self.brightness = 0
+
+    def async_write_ha_state(self):
+        self.hass.states.async_set(self.entity_id, "on", {"brightness": self.brightness})
+
+
+def test_benchmark_batched_writes_of_200_lights(tmp_path):
+    """A scene turns 200 lights on, each updated by event/3 and by its group state."""
+    pytest.importorskip("homeassistant.helpers.entity")
+    from custom_components.general_link.entity import StateWriteBatcher
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            lights = [WritingEntity(hass, index) for index in range(200)]
+            fired = []
+            hass.bus.async_listen("state_changed", fired.append)
+
+            started = time.perf_counter()
+            for brightness in (100, 200):
+                for light in lights:
+                    light.brightness = brightness
+                    light.async_write_ha_state()
+            await hass.async_block_till_done()
+            direct = time.perf_counter() - started, len(fired)
+
+            fired.clear()
+            batcher = StateWriteBatcher(hass, delay=0)
+            started = time.perf_counter()
+            for brightness in (50, 150):
+                for light in lights:
+                    light.brightness = brightness
+                    batcher.async_schedule(light)
+            await asyncio.sleep(0)
+            await hass.async_block_till_done()
+            batched = time.perf_counter() - started, len(fired)
+            return direct, batched, batcher.stats, hass.states.get("light.light_0")
+        finally:
+            await hass.async_stop(force=True)
+
+    direct, batched, stats, state = asyncio.run(run())
+    print(
+        f"\n200 lights updated twice: direct {direct[1]} writes {direct[0] * 1000:.1f} ms, "
+        f"batched {batched[1]} writes in {stats['flushes']} flush {batched[0] * 1000:.1f} ms"
+    )
+    assert direct[1] == 400
+    assert batched[1] == 200
+    assert stats == {"scheduled": 400, "written": 200, "flushes": 1}
+    # The flush writes the latest state
+    assert state.attributes["brightness"] == 150
+
+
+def test_failing_write_does_not_drop_the_other_writes(tmp_path, caplog):
+    pytest.importorskip("homeassistant.helpers.entity")
+    from custom_components.general_link.entity import StateWriteBatcher
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            lights = [WritingEntity(hass, index) for index in range(3)]
+
+            def fail():
+                raise ValueError("brightness")
+
+            lights[0].async_write_ha_state = fail
+            batcher = StateWriteBatcher(hass, delay=0)
+            for light in lights:
+                batcher.async_schedule(light)
+            await asyncio.sleep(0)
+            await hass.async_block_till_done()
+            return [hass.states.get(light.entity_id) for light in lights]
+        finally:
+            await hass.async_stop(force=True)
+
+    states = asyncio.run(run())
+    assert states[0] is None
+    assert all(state is not None for state in states[1:])
+    assert "Error writing the state of light.light_0" in caplog.text
@@ -0,0 +1,137 @@
+"""Load tests of several gateways sharing one Home Assistant instance."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from .common import (
+    GATEWAY_DATA,
+    ConfigEntryStub,
+    FakePahoClient,
+    async_test_home_assistant,
+)
+
+COMMANDS = 50
+
+
+class StalledPahoClient(FakePahoClient):
+    """A paho client stuck in publish, like one writing to a dead socket."""
+
+    def __init__(self, mqtt_client, release: threading.Event) -> None:
+        super().__init__(mqtt_client)
+        self._release = release
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self._release.wait()
+        return super().publish(topic, payload, qos, retain)
+
+
+async def _async_setup_gateways(hass, count):
+    """Create the gateways and give their clients the threaded transport and a fake paho."""
+    from custom_components.general_link.Gateway import Gateway
+    from custom_components.general_link.const import MQTT_CLIENT_INSTANCE
+    from custom_components.general_link.mqtt import MqttClient, get_mqtt_client
+
+    entries = []
+    for index in range(count):
+        entry = ConfigEntryStub(
+            {**GATEWAY_DATA, "mqttAddr": f"gw{index}"}, entry_id=f"entry{index}"
+        )
+        gateway = Gateway(hass, entry)
+        assert get_mqtt_client(hass, entry) is gateway.mqtt_client
+        mqtt_client = MqttClient(hass, entry, entry.data, loop_transport=False)
+        mqtt_client._client = FakePahoClient(mqtt_client)
+        mqtt_client.connected = True
+        hass.data[MQTT_CLIENT_INSTANCE][entry.entry_id] = mqtt_client
+        entries.append(entry)
+    return [get_mqtt_client(hass, entry) for entry in entries]
+
+
+async def _async_send_commands(mqtt_client, commands=COMMANDS):
+    for level in range(commands):
+        await mqtt_client.async_publish("P/gw/center/q20", b"%d" % level, 1, False)
+
+
+@pytest.mark.parametrize("count", [1, 4, 16])
+def test_gateways_each_use_their_own_client(tmp_path, count):
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            clients = await _async_setup_gateways(hass, count)
+            started = time.perf_counter()
+            await asyncio.gather(*(_async_send_commands(mqtt_client) for mqtt_client in clients))
+            return clients, time.perf_counter() - started
+        finally:
+            await hass.async_stop(force=True)
+
+    clients, elapsed = asyncio.run(run())
+    print(
+        f"\n{count} gateways x {COMMANDS} QoS 1 commands: {elapsed * 1000:.0f} ms, "
+        f"{count * COMMANDS / elapsed:.0f} commands/s"
+    )
+    assert len({id(mqtt_client) for mqtt_client in clients}) == count
+    for mqtt_client in clients:
+        assert len(mqtt_client._client.published) == COMMANDS
+        assert mqtt_client.ack_stats["outstanding"] == 0
+
+
+def test_stalled_gateway_does_not_block_the_others(tmp_path):
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    release = threading.Event()
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            stalled, *others = await _async_setup_gateways(hass, 4)
+            stalled._client = StalledPahoClient(stalled, release)
+            stalled_commands = hass.async_create_task(_async_send_commands(stalled, 1))
+            await asyncio.sleep(0)
+            # Would wait on the stalled publish if the gateways shared a client or lock
+            await asyncio.wait_for(
+                asyncio.gather(*(_async_send_commands(mqtt_client) for mqtt_client in others)), 5
+            )
+            done_while_stalled = stalled_commands.done()
+            release.set()
+            await stalled_commands
+            return done_while_stalled, others
+        finally:
+            release.set()
+            await hass.async_stop(force=True)
+
+    done_while_stalled, others = asyncio.run(run())
+    assert not done_while_stalled
+    for mqtt_client in others:
+        assert len(mqtt_client._client.published) == COMMANDS
+
+
+def test_reinit_runs_when_the_connection_data_is_unchanged(tmp_path):
+    """The connection monitor re-inits a gateway whose init failed on the same data."""
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    from custom_components.general_link.Gateway import Gateway
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            entry = ConfigEntryStub()
+            gateway = Gateway(hass, entry)
+            assert gateway.entry_data == entry.data
+            calls = []
+
+            async def init(init_entry, is_init):
+                calls.append((init_entry, is_init, gateway.reconnect_flag))
+
+            gateway.init = init
+            gateway.async_reinit(entry)
+            await hass.async_block_till_done()
+            return entry, calls
+        finally:
+            await hass.async_stop(force=True)
+
+    entry, calls = asyncio.run(run())
+    assert calls == [(entry, True, True)]
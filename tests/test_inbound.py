@@ -0,0 +1,136 @@
+"""Tests for the inbound buffer drop and coalesce policies."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.general_link.inbound import (
+    DEFAULT_INBOUND_POLICIES,
+    POLICY_DROP_OLDEST,
+    POLICY_KEEP,
+    InboundBuffer,
+)
+
+from .common import ConfigEntryStub, async_test_home_assistant
+
+STATE_TOPIC = "p/gw1/event/3"
+LOG_TOPIC = "p/gw1/report/q8"
+RESPONSE_TOPIC = "P/gw1/center/p5"
+
+
+def _message(topic, payload):
+    return SimpleNamespace(topic=topic, payload=json.dumps(payload).encode())
+
+
+def _state(sn, **fields):
+    return _message(STATE_TOPIC, {"data": [{"sn": sn, **fields}]})
+
+
+def _log(number):
+    return _message(LOG_TOPIC, {"log": number})
+
+
+def _payloads(buffer):
+    return [json.loads(msg.payload) for msg in buffer.take_all()]
+
+
+def test_full_buffer_evicts_logs_before_states():
+    buffer = InboundBuffer(max_size=3)
+    assert buffer.put(_state("a", a15=1))
+    assert buffer.put(_log(1))
+    assert buffer.put(_state("b", a15=1))
+
+    assert buffer.put(_state("c", a15=1))
+    assert buffer.dropped == 1
+    assert [payload["data"][0]["sn"] for payload in _payloads(buffer)] == ["a", "b", "c"]
+
+
+def test_incoming_log_is_dropped_instead_of_a_state():
+    buffer = InboundBuffer(max_size=2)
+    buffer.put(_state("a", a15=1))
+    buffer.put(_state("b", a15=1))
+
+    assert not buffer.put(_log(1))
+    assert buffer.dropped == 1
+    assert [payload["data"][0]["sn"] for payload in _payloads(buffer)] == ["a", "b"]
+
+
+def test_responses_are_kept_above_the_bound():
+    buffer = InboundBuffer(max_size=1)
+    buffer.put(_message(RESPONSE_TOPIC, {"seq": 1}))
+    assert buffer.put(_message(RESPONSE_TOPIC, {"seq": 2}))
+    assert len(buffer) == 2
+    assert buffer.dropped == 0
+
+
+def test_states_are_not_merged_without_backpressure():
+    buffer = InboundBuffer(max_size=100)
+    buffer.put(_state("a", a15=1))
+    buffer.put(_state("a", a15=0))
+
+    assert buffer.coalesced == 0
+    assert [payload["data"][0]["a15"] for payload in _payloads(buffer)] == [1, 0]
+
+
+def test_states_are_merged_near_the_bound():
+    buffer = InboundBuffer(max_size=5)
+    for number in range(3):
+        buffer.put(_log(number))
+    buffer.put(_state("a", a14=10, a15=1))
+    # Four of five queued, at the coalesce threshold
+    assert not buffer.put(_state("a", a15=0))
+
+    assert buffer.coalesced == 1
+    assert _payloads(buffer)[-1]["data"] == [{"sn": "a", "a14": 10, "a15": 0}]
+
+
+def test_policy_cache_is_bounded():
+    buffer = InboundBuffer()
+    for number in range(1000):
+        buffer.policy_for(f"p/gw{number}/event/3")
+    assert len(buffer._policy_cache) <= 256
+
+
+def test_configured_policies_apply_to_new_messages():
+    buffer = InboundBuffer(max_size=2)
+    assert buffer.policy_for(STATE_TOPIC) == "latest"
+
+    buffer.configure(2, {**DEFAULT_INBOUND_POLICIES, "event/3": POLICY_DROP_OLDEST})
+    assert buffer.policy_for(STATE_TOPIC) == POLICY_DROP_OLDEST
+    for sn in ("a", "b", "c"):
+        assert buffer.put(_state(sn, a15=1))
+    assert [payload["data"][0]["sn"] for payload in _payloads(buffer)] == ["b", "c"]
+
+    buffer.configure(1, {**DEFAULT_INBOUND_POLICIES, "report/q8": POLICY_KEEP})
+    buffer.put(_log(1))
+    assert buffer.put(_log(2))
+    assert buffer.dropped == 1
+
+
+def test_gateway_builds_its_client_from_the_entry_options(tmp_path):
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    from custom_components.general_link.Gateway import Gateway
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            entry = ConfigEntryStub(
+                options={"inbound_max_size": 200, "inbound_event_policy": POLICY_DROP_OLDEST}
+            )
+            gateway = Gateway(hass, entry)
+            inbound = gateway.mqtt_client._inbound_queue
+            configured = inbound.max_size, inbound.policy_for(STATE_TOPIC), inbound.policy_for(LOG_TOPIC)
+
+            # Options changed later are applied to the running client
+            entry.options = {"inbound_report_policy": POLICY_KEEP}
+            gateway.mqtt_client.configure_inbound(**gateway.inbound_options())
+            changed = inbound.max_size, inbound.policy_for(STATE_TOPIC), inbound.policy_for(LOG_TOPIC)
+            return configured, changed
+        finally:
+            await hass.async_stop(force=True)
+
+    configured, changed = asyncio.run(run())
+    assert configured == (200, POLICY_DROP_OLDEST, POLICY_DROP_OLDEST)
+    assert changed == (5000, "latest", POLICY_KEEP)
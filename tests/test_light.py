@@ -0,0 +1,82 @@
+"""Publishes per user action of the merged and coalesced light commands."""
+import asyncio
+import json
+
+import pytest
+
+from .common import ConfigEntryStub, async_test_home_assistant, mqtt_client_with_fake_paho
+
+LIGHT_CONFIG = {
+    "unique_id": "l1",
+    "name": "light",
+    "is_group": False,
+    "model": "M1",
+    "sn": "l1",
+    "on": 0,
+}
+
+
+async def _async_light(hass):
+    """Return a light whose commands go to a fake paho client, and that client."""
+    from custom_components.general_link.const import MQTT_CLIENT_INSTANCE
+    from custom_components.general_link.light import CustomLight
+
+    entry = ConfigEntryStub()
+    mqtt_client = mqtt_client_with_fake_paho(hass, entry)
+    hass.data.setdefault(MQTT_CLIENT_INSTANCE, {})[entry.entry_id] = mqtt_client
+    light = CustomLight(hass, LIGHT_CONFIG, entry)
+    light.entity_id = "light.light"
+    light.async_write_ha_state = lambda: None
+    return light, mqtt_client._client.published
+
+
+def _commands(published):
+    return [json.loads(payload)["data"] for _, payload, _, _ in published]
+
+
+def test_turn_on_with_brightness_and_color_temp_publishes_once(tmp_path):
+    pytest.importorskip("homeassistant.components.light")
+    pytest.importorskip("paho.mqtt.client")
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            light, published = await _async_light(hass)
+            await light.async_turn_on(brightness=102, color_temp=370)
+            await asyncio.sleep(0.4)
+            return published
+        finally:
+            await hass.async_stop(force=True)
+
+    published = asyncio.run(run())
+    print(f"\nturn on at 40% warm white: {len(published)} publish")
+    assert [topic for topic, _, _, _ in published] == ["P/gw1/center/q20"]
+    command = _commands(published)[0]
+    assert command["on"] == 1
+    assert command["level"] == 0.4
+    assert "kelvin" in command
+
+
+def test_slider_drag_publishes_one_command_per_window(tmp_path):
+    """20 brightness steps over 2 s, as sent while dragging a slider."""
+    pytest.importorskip("homeassistant.components.light")
+    pytest.importorskip("paho.mqtt.client")
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            light, published = await _async_light(hass)
+            light.on_off = True
+            for step in range(1, 21):
+                await light.async_turn_on(brightness=step * 12)
+                await asyncio.sleep(0.1)
+            await asyncio.sleep(0.4)
+            return published
+        finally:
+            await hass.async_stop(force=True)
+
+    published = asyncio.run(run())
+    print(f"\n20 slider steps over 2 s: {len(published)} publishes")
+    # The first step at once, then one per 0.3 s window
+    assert len(published) == 8
+    assert _commands(published)[-1]["level"] == round(240 / 255, 6)
@@ -0,0 +1,45 @@
+"""Benchmark of the command publish paths of the MQTT client."""
+import asyncio
+import time
+
+import pytest
+
+from .common import ConfigEntryStub, async_test_home_assistant, mqtt_client_with_fake_paho
+
+COMMANDS = 1000
+
+
+def test_benchmark_qos0_commands_per_second(tmp_path):
+    """QoS 0 skips the executor hop and the ACK wait every QoS 1 command takes."""
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            # Threaded transport, where every waited-on publish hops to the executor
+            mqtt_client = mqtt_client_with_fake_paho(
+                hass, ConfigEntryStub(), loop_transport=False
+            )
+            rates = {}
+            for qos in (1, 0):
+                started = time.perf_counter()
+                for level in range(COMMANDS):
+                    await mqtt_client.async_publish(
+                        "P/gw1/center/q20", b'{"level":%d}' % level, qos, False
+                    )
+                rates[qos] = COMMANDS / (time.perf_counter() - started)
+            await hass.async_block_till_done()
+            return mqtt_client, rates
+        finally:
+            await hass.async_stop(force=True)
+
+    mqtt_client, rates = asyncio.run(run())
+    print(
+        f"\n{COMMANDS} commands: executor + ACK wait {rates[1]:.0f}/s, "
+        f"QoS 0 fast path {rates[0]:.0f}/s"
+    )
+    assert len(mqtt_client._client.published) == 2 * COMMANDS
+    assert mqtt_client.ack_stats["outstanding"] == 0
+    assert not mqtt_client._fire_and_forget_mids
+    assert rates[0] > rates[1]
@@ -0,0 +1,76 @@
+"""Tests that a device event is handled once however the gateway subscribes."""
+import asyncio
+
+import pytest
+
+from custom_components.general_link.topic_trie import TopicTrie, reduce_topic_filters
+
+from .common import GATEWAY_DATA, ConfigEntryStub, async_test_home_assistant, mqtt_message
+
+EVENT_TOPICS = ["p/gw1/event/3", "p/gw2/event/3", "p/gw1/event/4"]
+
+
+def _handler_calls(topic_filters, topic):
+    """Subscribe one counting handler per filter, return the calls for one message."""
+    calls = []
+    trie = TopicTrie()
+    for topic_filter in topic_filters:
+        trie.add(topic_filter, calls.append)
+    for handler in trie.match(topic):
+        handler(topic)
+    return len(calls)
+
+
+def test_overlapping_event_filters_handle_a_message_once():
+    # Local gateway without certificate: p/{mqttAddr1}/event/3 with
+    # mqttAddr1 = "+", plus the p/+/event/3 added for other gateways
+    topic_filters = ["p/+/event/3", "p/+/event/4", "p/+/event/3"]
+
+    before = sum(_handler_calls(topic_filters, topic) for topic in EVENT_TOPICS)
+    after = sum(_handler_calls(reduce_topic_filters(topic_filters), topic) for topic in EVENT_TOPICS)
+
+    assert before == 5
+    assert after == len(EVENT_TOPICS)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {**GATEWAY_DATA, "local": True},
+        GATEWAY_DATA,
+    ],
+    ids=["local", "remote"],
+)
+def test_gateway_subscriptions_handle_an_event_once(tmp_path, data):
+    """Drive the gateway's own subscriptions through its MQTT client."""
+    pytest.importorskip("homeassistant.components.mqtt")
+    pytest.importorskip("paho.mqtt.client")
+    from custom_components.general_link.Gateway import Gateway
+
+    async def run():
+        hass = await async_test_home_assistant(tmp_path)
+        try:
+            gateway = Gateway(hass, ConfigEntryStub(data))
+            handled = []
+
+            async def count(topic, payload):
+                handled.append(topic)
+
+            gateway.register_topic_handler("event/3", count)
+            topics = gateway._discovery_topics()
+            await gateway.mqtt_client.async_subscribe_bulk(
+                topics, {topic: gateway._topic_callback(topic) for topic in topics}, 0, None
+            )
+            for topic in ("p/gw1/event/3", "p/other/event/3"):
+                gateway.mqtt_client._mqtt_handle_message(
+                    mqtt_message(topic, b'{"data":[{"sn":"a","on":1}]}')
+                )
+            await hass.async_block_till_done()
+            return topics, handled
+        finally:
+            await hass.async_stop(force=True)
+
+    topics, handled = asyncio.run(run())
+    assert topics.count("p/+/event/3") == 1
+    assert "p/gw1/event/3" not in topics
+    assert handled == ["p/gw1/event/3", "p/other/event/3"]
@@ -0,0 +1,95 @@
+"""Tests for the sensor state write throttle."""
+import random
+from types import SimpleNamespace
+
+from custom_components.general_link.const import (
+    CONF_SENSOR_ABS_DEADBAND,
+    CONF_SENSOR_MAX_INTERVAL,
+    CONF_SENSOR_MIN_INTERVAL,
+    CONF_SENSOR_REL_DEADBAND,
+)
+from custom_components.general_link.throttle import StateThrottle
+
+
+def _throttle(**options):
+    return StateThrottle(SimpleNamespace(options={
+        CONF_SENSOR_MIN_INTERVAL: 10,
+        CONF_SENSOR_MAX_INTERVAL: 300,
+        CONF_SENSOR_ABS_DEADBAND: 0,
+        CONF_SENSOR_REL_DEADBAND: 1,
+        **options,
+    }))
+
+
+def test_first_value_is_written_at_once():
+    assert _throttle().delay(230, 0) == 0
+
+
+def test_unchanged_value_is_not_written():
+    throttle = _throttle()
+    throttle.written(230, 0)
+    assert throttle.delay(230, 1000) is None
+
+
+def test_large_change_waits_for_the_min_interval():
+    throttle = _throttle()
+    throttle.written(230, 0)
+    assert throttle.delay(240, 4) == 6
+    assert throttle.delay(240, 12) == 0
+
+
+def test_change_inside_the_deadband_waits_for_the_max_interval():
+    throttle = _throttle()
+    throttle.written(230, 0)
+    # 1% of 230
+    assert throttle.delay(232, 4) == 296
+
+
+def test_absolute_deadband():
+    throttle = _throttle(**{CONF_SENSOR_ABS_DEADBAND: 5, CONF_SENSOR_REL_DEADBAND: 0})
+    throttle.written(10, 0)
+    assert throttle.delay(14, 0) == 300
+    assert throttle.delay(16, 0) == 10
+
+
+def test_non_numeric_value_is_outside_the_deadband():
+    throttle = _throttle()
+    throttle.written("on", 0)
+    assert throttle.delay("off", 0) == 10
+
+
+def test_options_apply_to_the_next_value():
+    throttle = _throttle()
+    throttle.written(230, 0)
+    throttle._config_entry.options[CONF_SENSOR_MIN_INTERVAL] = 1
+    assert throttle.delay(240, 0) == 1
+
+
+def test_replayed_voltage_day_writes_a_sixth_of_the_reports():
+    """A voltage report every 2 s for a day, noise around 220 V, default options."""
+    rng = random.Random(1)
+    throttle = StateThrottle(SimpleNamespace(options={}))
+    throttle.written(220.0, 0)
+    reports = writes = 0
+    pending = None
+    value = 220.0
+    for step in range(1, 43200):
+        now = step * 2.0
+        if pending is not None and pending <= now:
+            throttle.written(value, pending)
+            writes += 1
+            pending = None
+        value = round(220 + rng.gauss(0, 1.5), 1)
+        reports += 1
+        delay = throttle.delay(value, now)
+        if delay is None:
+            pending = None
+        elif delay == 0:
+            throttle.written(value, now)
+            writes += 1
+            pending = None
+        elif pending is None or pending > now + delay:
+            pending = now + delay
+    print(f"\n{reports} reports, {writes} state writes")
+    assert reports == 43199
+    assert writes == 7188
@@ -0,0 +1,136 @@
+"""Tests and a lookup benchmark for the subscription topic trie."""
+import time
+
+import pytest
+
+from custom_components.general_link.topic_trie import (
+    TopicTrie,
+    reduce_topic_filters,
+    topic_matches,
+)
+
+FILTERS = [
+    "p/+/event/3",
+    "p/gw1/event/3",
+    "p/gw1/event/+",
+    "p/gw1/#",
+    "P/gw1/center/p5",
+    "P/gw1/center/#",
+    "+/+/+/+",
+    "#",
+    "+/#",
+]
+
+TOPICS = [
+    "p/gw1/event/3",
+    "p/gw2/event/3",
+    "p/gw1/event/4",
+    "p/gw1",
+    "P/gw1/center/p5",
+    "P/gw1/center/p82",
+    "P/gw1/center",
+    "$SYS/broker/load",
+    "a/b/c/d/e",
+]
+
+
+@pytest.mark.parametrize("topic", TOPICS)
+def test_trie_matches_like_topic_matches(topic):
+    trie = TopicTrie()
+    for topic_filter in FILTERS:
+        trie.add(topic_filter, topic_filter)
+
+    expected = [topic_filter for topic_filter in FILTERS if topic_matches(topic_filter, topic)]
+    assert sorted(trie.match(topic)) == sorted(expected)
+
+
+def test_trie_cache_follows_add_and_remove():
+    trie = TopicTrie()
+    trie.add("p/gw1/event/3", "exact")
+    assert trie.match("p/gw1/event/3") == ["exact"]
+
+    trie.add("p/+/event/3", "wildcard")
+    assert sorted(trie.match("p/gw1/event/3")) == ["exact", "wildcard"]
+
+    assert trie.remove("p/gw1/event/3", "exact")
+    assert trie.match("p/gw1/event/3") == ["wildcard"]
+    assert not trie.remove("p/gw1/event/3", "exact")
+
+    assert trie.remove("p/+/event/3", "wildcard")
+    assert trie.match("p/gw1/event/3") == []
+
+
+def test_subscribing_keeps_unrelated_cached_topics():
+    trie = TopicTrie()
+    trie.add("p/+/event/3", "events")
+    trie.add("P/gw1/center/p5", "devices")
+    trie.match("p/gw1/event/3")
+    trie.match("P/gw1/center/p5")
+
+    trie.add("P/gw1/center/p28", "scenes")
+    trie.remove("P/gw1/center/p5", "devices")
+
+    assert "p/gw1/event/3" in trie._cache
+    assert "P/gw1/center/p5" not in trie._cache
+
+
+def test_reduce_topic_filters():
+    assert reduce_topic_filters(
+        ["p/gw1/event/3", "p/gw1/event/4", "p/+/event/3", "p/gw1/event/4"]
+    ) == ["p/gw1/event/4", "p/+/event/3"]
+    assert reduce_topic_filters(["p/gw1/#", "p/gw1/event/3"]) == ["p/gw1/#"]
+    # A '+' level is only covered by '+' or '#'
+    assert reduce_topic_filters(["p/+/event/3", "p/gw1/+/3"]) == ["p/+/event/3", "p/gw1/+/3"]
+
+
+def _subscriptions(count):
+    """Gateway-like filters: one exact filter per device topic plus a few wildcards."""
+    filters = ["p/+/event/3", "p/+/event/4", "P/gw1/center/#"]
+    filters += [f"p/gw{index}/event/{index % 5}" for index in range(count - len(filters))]
+    return filters
+
+
+def _linear_match(filters, topic):
+    """The previous lookup: every subscription's matcher runs on the topic."""
+    return [topic_filter for topic_filter in filters if topic_matches(topic_filter, topic)]
+
+
+def _best_of(func, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+@pytest.mark.parametrize("count", [10, 100, 1000])
+def test_benchmark_trie_against_linear_scan(count):
+    filters = _subscriptions(count)
+    topics = [f"p/dev{index}/event/3" for index in range(200)]
+    trie = TopicTrie()
+    for topic_filter in filters:
+        trie.add(topic_filter, topic_filter)
+
+    def trie_lookups():
+        # Distinct event topics keep missing the cache, as with p/+/event/3
+        trie.cache_clear()
+        for topic in topics:
+            trie.match(topic)
+
+    def linear_lookups():
+        for topic in topics:
+            _linear_match(filters, topic)
+
+    for topic in topics:
+        assert sorted(trie.match(topic)) == sorted(_linear_match(filters, topic))
+
+    trie_seconds = _best_of(trie_lookups)
+    linear_seconds = _best_of(linear_lookups)
+    print(
+        f"\n{count} subscriptions, {len(topics)} uncached topics: "
+        f"trie {trie_seconds * 1000:.2f} ms, linear {linear_seconds * 1000:.2f} ms, "
+        f"{linear_seconds / trie_seconds:.0f}x"
+    )
+    if count >= 100:
+        assert trie_seconds < linear_seconds